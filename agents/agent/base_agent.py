@@ -1,14 +1,97 @@
 # agents/agent/base_agent.py
 
+import asyncio
+import functools
 import json
 import logging
-
-from openai import OpenAI
-import tiktoken
+import re
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from openai import APIConnectionError, AsyncOpenAI, DefaultAsyncHttpxClient, InternalServerError, RateLimitError
+from openai.types.chat import ChatCompletion
+import orjson
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from agents.agent.response_cache import get_response_cache, make_cache_key
+from agents.agent.token_counter import TokenCounter, get_token_counter
 
 logger = logging.getLogger("reply_tests")
 
+# One "Function called / Arguments passed / Result" block of a tool-result message
+_TOOL_RESULT_BLOCK_RE = re.compile(
+    r"Function called: (?P<name>[^\n]*)\nArguments passed: (?P<arguments>.*?)\nResult:\n(?P<result>.*?)"
+    r"(?=\n\nFunction called: |\Z)",
+    re.DOTALL
+)
+
+
+class _TokenLedger:
+    """
+    Token counts for the messages of one stage conversation (kept parallel to
+    the message list), with a running total so budget checks are O(1).
+    """
+
+    def __init__(self):
+        self.counts = []
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def append(self, count: int) -> None:
+        self.counts.append(count)
+        self.total += count
+
+    def splice(self, start: int, end: int, counts: List[int]) -> None:
+        """
+        Replaces the counts in [start, end) with `counts`, mirroring a slice
+        assignment on the message list.
+        """
+        self.total += sum(counts) - sum(self.counts[start:end])
+        self.counts[start:end] = counts
+
+
 class BaseAgent:
+    # Upper bound on concurrent model calls per process (shared across all agent instances)
+    MAX_CONCURRENCY = 8
+    _semaphores = weakref.WeakKeyDictionary()
+
+    # Keep-alive connection pool (HTTP/2 when `h2` is installed) shared by the OpenAI
+    # clients of all agent instances on the same event loop
+    HTTP_MAX_CONNECTIONS = 64
+    _http_clients = weakref.WeakKeyDictionary()
+
+    # Retry with exponential backoff (plus jitter) on transient API failures:
+    # rate limits (429), server errors (5xx) and dropped connections/timeouts
+    TRANSIENT_API_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+    API_RETRY_ATTEMPTS = 6
+    API_RETRY_MAX_DELAY = 60
+
+    # Tag the static prompt prefix with `cache_control` (Anthropic-compatible endpoints).
+    # OpenAI caches stable prefixes automatically and does not accept this field.
+    PROMPT_CACHE_CONTROL = False
+
+    # Run the tool calls of a single model turn concurrently. Subclasses whose tool
+    # handlers are not thread-safe should disable this.
+    PARALLEL_TOOL_CALLS = True
+
+    # Meta-tool (see base_agent_tools.json) letting the model request several calls at once
+    BATCH_TOOL_NAME = "batch_tool_calls"
+
+    # Maximum prompt size (in tokens) sent to the model
+    TOKEN_LIMIT = 13000
+
+    # Header of the system message that older Execution steps are folded into
+    PRIOR_STEPS_HEADER = "Prior steps summary:"
+
     BASE_SYSTEM_MESSAGE = (
         "You are a specialized multi-stage agent designed to solve complex tasks by operating in two distinct stages:\n\n"
         "**1. Deliberation Period (Stage 1)**:\n"
@@ -29,6 +112,10 @@ class BaseAgent:
 
         "Remember, your success depends on adhering to the staged workflow and producing meaningful, stage-appropriate outputs."
     )
+
+    # Agent-specific persona; subclasses override this and it is appended to every stage prefix
+    PERSONA = ""
+
     # -------------------------------------------------------------------------
     # Stage-Specific System Messages
     # -------------------------------------------------------------------------
@@ -139,22 +226,54 @@ class BaseAgent:
         "call `end_execution_loop` with an appropriate summary. This will signal the end of Stage 2."
     )
 
-    def __init__(self, api_key: str, model_name: str = "gpt-4o-mini"):
+    def __init__(
+            self,
+            api_key: str,
+            model_name: str = "gpt-4o-mini",
+            use_batch_api: bool = False,
+            token_counter: Optional[TokenCounter] = None,
+            cache: Optional[str] = None,
+            cache_dir: Optional[str] = None,
+            stream: bool = True
+    ):
         """
         BaseAgent initializes common agent behavior:
         - Manages stage-specific conversations to reduce token usage.
         - Loads and stores tool definitions.
         - Tracks token usage for budgeting.
+
+        :param use_batch_api: Enables `submit_batch`/`poll_batch` for offline workloads
+                              routed through OpenAI's (discounted, 24h) Batch API.
+        :param token_counter: Tokenizer used for prompt budgeting (defaults to the shared tiktoken counter).
+        :param cache: Response cache for model calls: None (disabled), "memory" (process-wide LRU),
+                      or "disk" (persistent, requires `diskcache`).
+        :param cache_dir: Directory for the "disk" cache (optional).
+        :param stream: Stream model responses and assemble them as chunks arrive.
         """
 
         import os
 
-        self.client = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self._clients = weakref.WeakKeyDictionary()  # One OpenAI client per event loop (see `client`)
         self.model_name = model_name
-
-        # Maintain separate message lists for each stage
+        self.use_batch_api = use_batch_api
+        self.token_counter = token_counter or get_token_counter()
+        self.response_cache = get_response_cache(cache, cache_dir) if cache else None
+        self.stream = stream
+
+        # Maintain separate message lists for each stage. These hold only the dynamic
+        # part of each conversation; the static system prompt for each stage is kept
+        # as a frozen prefix (see `_get_stage_prefix`) so provider prompt caching hits.
         self.deliberation_messages = []
         self.execution_messages = []
+        self._stage_prefixes = {}
+        self._stage_prefix_tokens = {}  # Token cost of each cached prefix, counted once
+
+        # Per-message token counts (and running totals), kept parallel to each stage's
+        # message list so the token budget check never has to re-tokenize the conversation
+        self.deliberation_tokens = _TokenLedger()
+        self.execution_tokens = _TokenLedger()
+        self._execution_loop_start = 0
 
         # Also store the user's original input for reference
         self.user_input = None
@@ -162,10 +281,12 @@ class BaseAgent:
         # Tooling and token usage
         self.tools = []
         self.total_tokens = 0
+        self.cached_tokens = 0  # Prompt tokens served from the provider's prompt cache
 
         # Dynamically resolve the relative path to `base_agent_tools.json`
         base_dir = os.path.dirname(__file__)  # Directory of the BaseAgent module
-        self.tools_description = ''
+        self._tool_description_chunks = []
+        self._tools_description = None
         json_path = os.path.join(base_dir, "base_agent_tools.json")
 
         # Load base tools
@@ -179,68 +300,175 @@ class BaseAgent:
         except Exception as e:
             logger.error(f"Unexpected error while loading tools from {json_path}: {str(e)}")
 
-        # Add the BASE_SYSTEM_MESSAGE to all message tracks
-        self.add_system_message(self.deliberation_messages, self.BASE_SYSTEM_MESSAGE)
-        self.add_system_message(self.execution_messages, self.BASE_SYSTEM_MESSAGE)
-
     # -------------------------------------------------------------------------
     # Message Management
     # -------------------------------------------------------------------------
-    def add_system_message(self, stage_messages: list, content: str):
-        stage_messages.append({"role": "system", "content": content})
+    def add_system_message(self, stage_messages: list, content: str, token_count: Optional[int] = None):
+        self._append_message(stage_messages, "system", content, token_count)
+
+    def add_user_message(self, stage_messages: list, content: str, token_count: Optional[int] = None):
+        self._append_message(stage_messages, "user", content, token_count)
+
+    def add_assistant_message(self, stage_messages: list, content: str, token_count: Optional[int] = None):
+        self._append_message(stage_messages, "assistant", content, token_count)
+
+    def _append_message(self, stage_messages: list, role: str, content: str, token_count: Optional[int] = None):
+        """
+        Appends a message to `stage_messages` and records its token count
+        when the list is one of this agent's stage conversations.
+        Pass `token_count` if it was already computed (e.g. off the event loop).
+        """
+        stage_messages.append({"role": role, "content": content})
+
+        ledger = self._token_ledger_for(stage_messages)
+        if ledger is not None:
+            if token_count is None:
+                token_count = self._num_tokens_from_string(content or "")
+            ledger.append(token_count)
+
+    def _token_ledger_for(self, stage_messages: list) -> Optional[_TokenLedger]:
+        """
+        Returns the token ledger tracked for `stage_messages`,
+        or None if the list is not a stage conversation of this agent.
+        """
+        if stage_messages is self.deliberation_messages:
+            return self.deliberation_tokens
+        if stage_messages is self.execution_messages:
+            return self.execution_tokens
+        return None
+
+    def reset_conversation(self):
+        """
+        Clears both stage conversations so the agent (with its loaded tools, cached
+        prefixes and clients) can be reused for an unrelated user input.
+        """
+        # Clear in place: the stage lists are matched to their ledgers by identity
+        self.deliberation_messages.clear()
+        self.execution_messages.clear()
+        self.deliberation_tokens = _TokenLedger()
+        self.execution_tokens = _TokenLedger()
+
+        self._execution_loop_start = 0
+        self.user_input = None
+
+    def _get_stage_prefix(self, stage: str) -> list:
+        """
+        Returns the static system prefix for `stage` ("deliberation" or "execution"):
+        a single system message combining BASE_SYSTEM_MESSAGE, the stage message,
+        (for Deliberation) the tools description, and the subclass PERSONA. The prefix
+        is built once and reused verbatim on every call so it stays byte-identical for
+        prompt caching.
+        Its token cost is counted once, on first use by `_prefix_token_count` (off the event loop).
+        """
+        prefix = self._stage_prefixes.get(stage)
+        if prefix is None:
+            if stage == "deliberation":
+                parts = [self.BASE_SYSTEM_MESSAGE, self.DELIBERATION_MESSAGE, self.tools_description, self.PERSONA]
+            elif stage == "execution":
+                parts = [self.BASE_SYSTEM_MESSAGE, self.EXECUTION_MESSAGE, self.PERSONA]
+            else:
+                raise ValueError(f"Unknown stage: {stage}")
 
-    def add_user_message(self, stage_messages: list, content: str):
-        stage_messages.append({"role": "user", "content": content})
+            message = {"role": "system", "content": "\n\n".join(part for part in parts if part)}
+            if self.PROMPT_CACHE_CONTROL:
+                message["cache_control"] = {"type": "ephemeral"}
 
-    def add_assistant_message(self, stage_messages: list, content: str):
-        stage_messages.append({"role": "assistant", "content": content})
+            prefix = [message]
+            self._stage_prefixes[stage] = prefix
+        return prefix
+
+    def _prefix_token_count(self, prefix: Optional[list]) -> Optional[int]:
+        """
+        Returns the memoized token cost of `prefix` if it is one of this agent's
+        cached stage prefixes (0 for no prefix), otherwise None. The cost is counted
+        on first call, so call this off the event loop (as `_trim_to_token_budget` is).
+        """
+        if not prefix:
+            return 0
+        for stage, cached_prefix in self._stage_prefixes.items():
+            if cached_prefix is prefix:
+                if stage not in self._stage_prefix_tokens:
+                    self._stage_prefix_tokens[stage] = self._num_tokens_from_string(prefix[0]["content"])
+                return self._stage_prefix_tokens[stage]
+        return None
 
     # -------------------------------------------------------------------------
     # Tooling and Token Usage
     # -------------------------------------------------------------------------
+    @property
+    def tools_description(self) -> str:
+        """
+        Human-readable description of every loaded tool, rendered once and
+        re-rendered only after more tools are loaded.
+        """
+        if self._tools_description is None:
+            self._tools_description = "\n\n".join(self._tool_description_chunks)
+        return self._tools_description
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _cached_tools(cls, json_path: str) -> Optional[Tuple[tuple, tuple]]:
+        """
+        Reads and parses a tools JSON file once per process (shared by all agent
+        instances), returning the tool definitions and their rendered descriptions,
+        or None if the file has an invalid structure.
+        """
+        # Read the JSON file
+        with open(json_path, "r", encoding="utf-8") as f:
+            tool_data = json.load(f)
+
+        # Check if tool_data is a list or a dictionary with a 'tools' key
+        if isinstance(tool_data, list):
+            tools = tool_data
+        elif isinstance(tool_data, dict) and "tools" in tool_data:
+            tools = tool_data["tools"]
+        else:
+            logger.warning(
+                f"Invalid JSON structure in {json_path}. Expected a top-level list or a dictionary with a 'tools' key."
+            )
+            return None
+
+        # Generate the description of the tools
+        tool_descriptions = []
+        for tool in tools:
+            function = tool.get("function", {})
+            name = function.get("name", "Unknown Tool")
+            description = function.get("description", "No description available.")
+            parameters = function.get("parameters", {}).get("properties", {})
+            params_str = "\n      ".join(
+                f"- {name} ({details.get('type', 'Unknown')}): {details.get('description', 'No description.')}"
+                for name, details in parameters.items()
+            )
+            tool_descriptions.append(
+                f"Tool: {name}\n"
+                f"  Description: {description}\n"
+                f"  Parameters:\n      {params_str if parameters else 'None'}"
+            )
+
+        return tuple(tools), tuple(tool_descriptions)
+
     def load_tools_from_json(self, json_path: str):
         """
         Loads a JSON file containing 'tools' definitions (array or dict with a 'tools' key),
-        appends them to self.tools, and generates a string description saved in self.tools_description.
+        appends them to self.tools, and appends their descriptions to self.tools_description.
+        The parsed file is cached on the class, so repeated loads skip the disk read and parsing.
         """
         try:
-            # Read the JSON file
-            with open(json_path, "r", encoding="utf-8") as f:
-                tool_data = json.load(f)
-
-            # Check if tool_data is a list or a dictionary with a 'tools' key
-            if isinstance(tool_data, list):
-                tools = tool_data
-            elif isinstance(tool_data, dict) and "tools" in tool_data:
-                tools = tool_data["tools"]
-            else:
-                logger.warning(
-                    f"Invalid JSON structure in {json_path}. Expected a top-level list or a dictionary with a 'tools' key."
-                )
+            cached = type(self)._cached_tools(json_path)
+            if cached is None:
                 return
+            tools, tool_descriptions = cached
 
             # Extend the tools list
             self.tools.extend(tools)
 
-            # Generate the tools description
-            tool_descriptions = []
-            for tool in tools:
-                function = tool.get("function", {})
-                name = function.get("name", "Unknown Tool")
-                description = function.get("description", "No description available.")
-                parameters = function.get("parameters", {}).get("properties", {})
-                params_str = "\n      ".join(
-                    f"- {name} ({details.get('type', 'Unknown')}): {details.get('description', 'No description.')}"
-                    for name, details in parameters.items()
-                )
-                tool_descriptions.append(
-                    f"Tool: {name}\n"
-                    f"  Description: {description}\n"
-                    f"  Parameters:\n      {params_str if parameters else 'None'}"
-                )
+            # Append to (rather than replace) the descriptions of previously loaded tools
+            self._tool_description_chunks.extend(tool_descriptions)
+            self._tools_description = None
 
-            # Save the generated description
-            self.tools_description = "\n\n".join(tool_descriptions)
+            # The tools description is part of the Deliberation prefix; rebuild it on next use
+            self._stage_prefixes.clear()
+            self._stage_prefix_tokens.clear()
 
             logger.info(f"Tools successfully loaded and description generated from {json_path}.")
 
@@ -250,78 +478,283 @@ class BaseAgent:
         except json.JSONDecodeError as e:
             logger.error(f"Error decoding JSON from {json_path}: {str(e)}")
 
-
     def track_token_usage(self, response) -> int:
         """
         Updates the total token usage for this instance based on the response.
         """
+        if response.usage is None:
+            return 0
         tokens_used = response.usage.total_tokens
         self.total_tokens += tokens_used
+
+        # Record how much of the prompt was served from the provider's prompt cache
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        if cached:
+            self.cached_tokens += cached
+            logger.info(f"Prompt cache hit: {cached}/{response.usage.prompt_tokens} prompt tokens cached.")
         return tokens_used
 
-    def _num_tokens_from_string(self, string: str, encoding_name: str) -> int:
+    def _num_tokens_from_string(self, string: str) -> int:
+        """
+        Returns the number of tokens in a text string, as counted by this agent's token counter.
+        """
+        return self.token_counter.count(string)
+
+    async def _num_tokens_from_string_async(self, string: str) -> int:
         """
-        Returns the number of tokens in a text string.
+        Counts tokens in the default executor so CPU-bound BPE work on large
+        strings does not stall the event loop shared by other agents.
         """
-        encoding = tiktoken.get_encoding(encoding_name)
-        num_tokens = len(encoding.encode(string))
-        return num_tokens
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._num_tokens_from_string, string or "")
 
     # -------------------------------------------------------------------------
     # Model Call Handling
     # -------------------------------------------------------------------------
-    def _call_model(
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """
+        Returns the process-wide semaphore bounding concurrent model calls
+        for the running event loop (one semaphore per loop).
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = cls._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(cls.MAX_CONCURRENCY)
+            cls._semaphores[loop] = semaphore
+        return semaphore
+
+    @classmethod
+    def _get_http_client(cls) -> httpx.AsyncClient:
+        """
+        Returns the process-wide HTTP client for the running event loop (one pool per loop,
+        since pooled connections cannot outlive the loop that opened them).
+        """
+        loop = asyncio.get_running_loop()
+        http_client = cls._http_clients.get(loop)
+        if http_client is None:
+            limits = httpx.Limits(
+                max_connections=cls.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=cls.HTTP_MAX_CONNECTIONS
+            )
+            try:
+                http_client = DefaultAsyncHttpxClient(http2=True, limits=limits)
+            except ImportError:
+                logger.warning("HTTP/2 support (`h2`) is not installed; using HTTP/1.1 keep-alive connections.")
+                http_client = DefaultAsyncHttpxClient(limits=limits)
+            cls._http_clients[loop] = http_client
+        return http_client
+
+    @classmethod
+    async def aclose_http_client(cls) -> None:
+        """
+        Closes the running event loop's shared HTTP client and its pooled connections.
+        Call this before the loop shuts down (the sync wrappers and the outreach processor
+        do); a later call on the same loop opens a new client.
+        """
+        http_client = cls._http_clients.pop(asyncio.get_running_loop(), None)
+        if http_client is not None:
+            await http_client.aclose()
+
+    def _run_sync(self, coro):
+        """
+        Runs `coro` on a new event loop (as the sync wrappers do), closing that loop's
+        HTTP client before the loop exits so its connections are not leaked.
+        """
+        async def _run():
+            try:
+                return await coro
+            finally:
+                await self.aclose_http_client()
+
+        return asyncio.run(_run())
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        The OpenAI client for the running event loop, backed by the shared connection pool.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=self._api_key, http_client=self._get_http_client())
+            self._clients[loop] = client
+        return client
+
+    async def _create_completion(self, messages: list, tools):
+        """
+        Issues the chat completion request, retrying with exponential backoff
+        (plus jitter) on transient API errors and re-raising once retries are exhausted.
+        """
+        retrying = AsyncRetrying(
+            retry=retry_if_exception_type(self.TRANSIENT_API_ERRORS),
+            wait=wait_random_exponential(min=1, max=self.API_RETRY_MAX_DELAY),
+            stop=stop_after_attempt(self.API_RETRY_ATTEMPTS),
+            before_sleep=before_sleep_log(logger, logging.WARNING),
+            reraise=True,
+        )
+        async for attempt in retrying:
+            with attempt:
+                # The semaphore is released while backing off so other calls can proceed
+                async with self._get_semaphore():
+                    if self.stream:
+                        return await self._stream_completion(messages, tools)
+                    return await self.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        tools=tools
+                    )
+
+    async def _stream_completion(self, messages: list, tools) -> ChatCompletion:
+        """
+        Requests a streamed completion and accumulates content and tool-call deltas
+        as they arrive, returning the assembled response in the same shape as a
+        non-streamed ChatCompletion (including usage).
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            tools=tools,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        completion = {"id": "", "created": 0, "model": self.model_name, "usage": None}
+        content_parts = []
+        tool_calls = {}
+        finish_reason = None
+
+        async for chunk in stream:
+            completion.update(id=chunk.id, created=chunk.created, model=chunk.model)
+            if chunk.usage:
+                completion["usage"] = chunk.usage.model_dump()
+            if not chunk.choices:
+                continue
+
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                content_parts.append(choice.delta.content)
+            for tool_delta in choice.delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(
+                    tool_delta.index,
+                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+                )
+                if tool_delta.id:
+                    tool_call["id"] = tool_delta.id
+                if tool_delta.function:
+                    tool_call["function"]["name"] += tool_delta.function.name or ""
+                    tool_call["function"]["arguments"] += tool_delta.function.arguments or ""
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+        message = {"role": "assistant", "content": "".join(content_parts) or None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+
+        return ChatCompletion.model_validate({
+            **completion,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": finish_reason or "stop", "message": message}],
+        })
+
+    async def _call_model(
             self,
             messages: list,
             use_tools: bool = True,
-            max_retries: int = 5
+            prefix: Optional[list] = None
     ):
         """
-        Makes a call to the OpenAI ChatCompletion API with the given messages.
+        Makes a call to the OpenAI ChatCompletion API with the static `prefix`
+        followed by the given (dynamic) messages.
         Optionally includes function-calling `tools` if `use_tools` is True.
-        Retries if a token limit error occurs.
+        Older messages are folded beforehand if the request would exceed the token limit.
         """
-        if not hasattr(self, "_token_error_count"):
-            self._token_error_count = 0
-
-        while self._token_error_count < max_retries:
-            try:
-                tools = self.tools if use_tools else None
+        tools = self.tools if use_tools else None
+
+        # Fit the request within the token budget before sending it. Budget checks and folding
+        # may encode text, so they run off the event loop shared with other agents.
+        await asyncio.to_thread(self._trim_to_token_budget, messages, prefix)
+
+        request_messages = (prefix or []) + messages
+
+        # Between folds (see `_compact_execution_history`) stage conversations are only appended
+        # to, so each request's prompt begins with the previous request's prompt and the provider
+        # can reuse its cached prefix. A fold rewrites the loop history into a new summary, so the
+        # request after it only hits the cache up to the user input and plan, and a marker placed
+        # on the newest message just before a fold is not reused. With explicit cache control,
+        # also mark the newest message so the next iteration reuses everything up to here.
+        if self.PROMPT_CACHE_CONTROL and messages:
+            request_messages[-1] = {**request_messages[-1], "cache_control": {"type": "ephemeral"}}
+
+        # Serve identical requests from the response cache when enabled
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = make_cache_key(self.model_name, request_messages, tools)
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.info("Model response served from cache:")
+                logger.info(self.extract_response_content(cached_response))
+                return cached_response
+
+        response = await self._create_completion(request_messages, tools)
+
+        # # Log the raw response for infoging
+        logger.info("Model response received:")
+        logger.info(self.extract_response_content(response))
+
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
+
+        # Track token usage
+        self.track_token_usage(response)
+        return response
+
+    def _is_within_token_budget(self, messages: list, prefix: Optional[list] = None) -> bool:
+        """
+        Checks the request against TOKEN_LIMIT using the memoized prefix cost and the tracked
+        per-message counts; any untracked text is encoded with early exit.
+        """
+        remaining_budget = self.TOKEN_LIMIT
+        untracked = []
 
-                # Estimate token usage for the messages
-                str_messages = "".join(msg["content"] for msg in messages if "content" in msg)
-                expected_tokens = self._num_tokens_from_string(str_messages, "cl100k_base")
+        prefix_tokens = self._prefix_token_count(prefix)
+        if prefix_tokens is not None:
+            remaining_budget -= prefix_tokens
+        else:
+            untracked.extend(msg for msg in prefix if "content" in msg)
 
-                if expected_tokens > 13000:
-                    raise ValueError("Token usage exceeds the maximum allowed limit of 13000.")
+        ledger = self._token_ledger_for(messages)
+        if ledger is not None and len(ledger) == len(messages):
+            remaining_budget -= ledger.total
+        else:
+            untracked.extend(msg for msg in messages if "content" in msg)
+        str_untracked = "".join(msg["content"] or "" for msg in untracked)
 
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    tools=tools
-                )
+        return self.token_counter.is_within_limit(str_untracked, remaining_budget)
 
-                # # Log the raw response for infoging
-                logger.info("Model response received:")
-                logger.info(self.extract_response_content(response))
+    def _trim_to_token_budget(self, messages: list, prefix: Optional[list] = None) -> None:
+        """
+        Folds progressively more of the oldest foldable messages (see `_fold_messages`)
+        until the request fits TOKEN_LIMIT. Raises ValueError if it cannot be made to fit.
+        """
+        if self._is_within_token_budget(messages, prefix):
+            return
 
-                # Track token usage
-                self.track_token_usage(response)
-                self._token_error_count = 0  # Reset on success
-                return response
+        # Only the Execution loop history can be folded; the user input and plan are kept
+        start = self._execution_loop_start if messages is self.execution_messages else len(messages)
 
-            except ValueError as e:
-                self._token_error_count += 1
-                if self._token_error_count >= max_retries:
-                    raise ValueError("Repeated token limit errors. Unable to proceed.") from e
+        keep_last = (len(messages) - start) // 2
+        while start < len(messages):
+            self._fold_messages(messages, start, len(messages) - keep_last)
+            if self._is_within_token_budget(messages, prefix):
+                logger.warning(f"Token limit exceeded; folded older messages to fit {self.TOKEN_LIMIT} tokens.")
+                return
+            if keep_last == 0:
+                break
+            keep_last //= 2
 
-                # Add a system message warning the agent in the same message list
-                warning_message = (
-                    "Warning: The previous response exceeded the token limit. "
-                    "The next response must be shorter."
-                )
-                self.add_system_message(messages, warning_message)
-                logger.warning(f"Token limit exceeded. Warning issued: {warning_message}")
+        raise ValueError(f"Token usage exceeds the maximum allowed limit of {self.TOKEN_LIMIT}.")
 
     def extract_response_content(self, response: dict) -> str:
         """
@@ -349,16 +782,95 @@ class BaseAgent:
         arguments_str = tool_call.function.arguments
 
         try:
-            arguments = json.loads(arguments_str)
-        except json.JSONDecodeError:
+            arguments = orjson.loads(arguments_str)
+        except orjson.JSONDecodeError:
             return None, None, response
 
         return function_name, arguments, response
 
+    def _parse_tool_calls(self, response) -> List[Tuple[str, dict]]:
+        """
+        Returns every tool call in the response as (function_name, arguments) pairs,
+        expanding `batch_tool_calls` requests into their individual calls.
+        Calls whose arguments are not a valid JSON object are skipped, and repeats of
+        an identical (name, arguments) call in the same response are dropped so a
+        side-effecting tool is not run twice (possibly concurrently) for one request.
+        """
+        if not response.choices:
+            return []
+
+        candidates = []
+        for tool_call in response.choices[0].message.tool_calls or []:
+            try:
+                arguments = orjson.loads(tool_call.function.arguments)
+            except orjson.JSONDecodeError:
+                logger.warning(f"Skipping tool call '{tool_call.function.name}' with invalid JSON arguments.")
+                continue
+
+            if tool_call.function.name == self.BATCH_TOOL_NAME:
+                calls = arguments.get("calls") if isinstance(arguments, dict) else None
+                if not isinstance(calls, list):
+                    logger.warning(f"Skipping '{self.BATCH_TOOL_NAME}' call without a list of 'calls'.")
+                    continue
+                for call in calls:
+                    if isinstance(call, dict) and call.get("name"):
+                        candidates.append((call["name"], call.get("arguments") or {}))
+            else:
+                candidates.append((tool_call.function.name, arguments))
+
+        parsed_calls = []
+        seen = set()
+        for name, arguments in candidates:
+            if not isinstance(arguments, dict):
+                logger.warning(f"Skipping tool call '{name}' whose arguments are not a JSON object.")
+                continue
+            key = (name, orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS))
+            if key in seen:
+                logger.warning(f"Skipping duplicate tool call '{name}' with identical arguments.")
+                continue
+            seen.add(key)
+            parsed_calls.append((name, arguments))
+
+        return parsed_calls
+
     # -------------------------------------------------------------------------
     # Public Workflow Entry
     # -------------------------------------------------------------------------
     def process_user_input(self, user_message: str):
+        """
+        Synchronous wrapper around `process_user_input_async` for callers
+        that are not running an event loop.
+        """
+        return self._run_sync(self.process_user_input_async(user_message))
+
+    @classmethod
+    async def run_batch_async(
+            cls,
+            api_key: str,
+            prompts: List[str],
+            max_concurrency: int = 8,
+            **kwargs
+    ) -> list:
+        """
+        Processes many user inputs concurrently, each with its own agent
+        (and therefore its own conversation state).
+
+        :param api_key: The API key passed to every agent.
+        :param prompts: The user inputs to process.
+        :param max_concurrency: Maximum number of conversations in flight at once.
+        :param kwargs: Extra constructor arguments for each agent.
+        :return: Results in the same order as `prompts`; failed prompts yield the raised exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _one(prompt: str):
+            async with semaphore:
+                agent = cls(api_key, **kwargs)
+                return await agent.process_user_input_async(prompt)
+
+        return await asyncio.gather(*(_one(prompt) for prompt in prompts), return_exceptions=True)
+
+    async def process_user_input_async(self, user_message: str):
         """
         Public entry point for handling user input across Deliberation,
         Execution, and Synthesis, returning the final user-facing response.
@@ -366,62 +878,175 @@ class BaseAgent:
         self.user_input = user_message
 
         # 1) Deliberation Stage (No Tools)
-        plan_content = self._enforce_deliberation_stage()
+        plan_content = await self._enforce_deliberation_stage()
 
         # 2) Execution Stage (Tools Allowed)
-        self.add_user_message(self.execution_messages, user_message)
-        execution_exit_statement = self._execute_plan(plan_content)
+        self.add_user_message(
+            self.execution_messages, user_message, await self._num_tokens_from_string_async(user_message)
+        )
+        execution_exit_statement = await self._execute_plan(plan_content)
 
         return execution_exit_statement
 
+    # -------------------------------------------------------------------------
+    # Batch API (Offline Workloads)
+    # -------------------------------------------------------------------------
+    def submit_batch(self, prompts: List[str]) -> str:
+        """
+        Synchronous wrapper around `submit_batch_async`.
+        """
+        return self._run_sync(self.submit_batch_async(prompts))
+
+    def poll_batch(self, batch_id: str, poll_interval: float = 30.0) -> Dict[str, Optional[str]]:
+        """
+        Synchronous wrapper around `poll_batch_async`.
+        """
+        return self._run_sync(self.poll_batch_async(batch_id, poll_interval))
+
+    async def submit_batch_async(self, prompts: List[str]) -> str:
+        """
+        Submits the Deliberation stage for every prompt as a single Batch API job.
+        Each request is tagged with `custom_id` "prompt-<index>" so results can be
+        mapped back to their prompt.
+
+        :return: The ID of the created batch.
+        """
+        if not self.use_batch_api:
+            raise ValueError("Batch API is disabled; construct the agent with use_batch_api=True.")
+
+        lines = []
+        for index, prompt in enumerate(prompts):
+            request = {
+                "custom_id": f"prompt-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model_name,
+                    "messages": self._deliberation_request_messages(prompt),
+                },
+            }
+            lines.append(json.dumps(request))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+        batch_file = await self.client.files.create(file=("batch_input.jsonl", payload), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(prompts)} requests.")
+        return batch.id
+
+    async def poll_batch_async(self, batch_id: str, poll_interval: float = 30.0) -> Dict[str, Optional[str]]:
+        """
+        Waits for a batch to finish, downloads its output file, and returns the
+        assistant content for each request keyed by `custom_id` (None for requests
+        that failed).
+        """
+        if not self.use_batch_api:
+            raise ValueError("Batch API is disabled; construct the agent with use_batch_api=True.")
+
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'.")
+            logger.info(f"Batch {batch_id} status: {batch.status}. Checking again in {poll_interval}s.")
+            await asyncio.sleep(poll_interval)
+
+        results = {}
+        if batch.output_file_id:
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                body = (record.get("response") or {}).get("body") or {}
+                choices = body.get("choices") or []
+                results[record["custom_id"]] = choices[0]["message"]["content"] if choices else None
+                usage = body.get("usage")
+                if usage:
+                    self.total_tokens += usage.get("total_tokens", 0)
+
+        if batch.error_file_id:
+            logger.warning(f"Batch {batch_id} reported errors; see file {batch.error_file_id}.")
+
+        return results
+
     # -------------------------------------------------------------------------
     # Deliberation Stage
     # -------------------------------------------------------------------------
-    def _enforce_deliberation_stage(self) -> str:
+    def _deliberation_request_messages(self, user_input: str) -> list:
+        """
+        Returns the Deliberation-stage messages for `user_input` without
+        modifying this agent's conversation state.
+        """
+        return self._get_stage_prefix("deliberation") + self.deliberation_messages + [
+            {"role": "user", "content": user_input},
+        ]
+
+    async def _enforce_deliberation_stage(self) -> str:
         """
         Ensures the agent operates in Deliberation mode to produce a plan/playbook
         without calling any tools. Returns the plan content.
         """
 
-        # Add system message for Deliberation
-        self.add_system_message(self.deliberation_messages, self.DELIBERATION_MESSAGE)
-
-        # Add the user's message so the model knows the original query
-        self.add_user_message(self.deliberation_messages, self.user_input)
-
-        # Add the description of available tools for planning
-        self.add_system_message(self.deliberation_messages, self.tools_description)
+        # Add the user's message so the model knows the original query.
+        # The Deliberation instructions and tools description live in the static prefix.
+        self.add_user_message(
+            self.deliberation_messages, self.user_input, await self._num_tokens_from_string_async(self.user_input)
+        )
 
         # Call the model with no tools
-        response = self._call_model(self.deliberation_messages, use_tools=False)
+        response = await self._call_model(
+            self.deliberation_messages,
+            use_tools=False,
+            prefix=self._get_stage_prefix("deliberation")
+        )
         plan_content = self.extract_response_content(response)
 
         # Record the plan content from the assistant
-        self.add_assistant_message(self.deliberation_messages, plan_content)
+        self.add_assistant_message(
+            self.deliberation_messages, plan_content, await self._num_tokens_from_string_async(plan_content)
+        )
 
         return plan_content
 
     # -------------------------------------------------------------------------
     # Execution Stage
     # -------------------------------------------------------------------------
-    def _execute_plan(self, plan_content: str, max_iterations: int = 99, final_checks: int = 0) -> str:
+    async def _execute_plan(
+            self,
+            plan_content: str,
+            max_iterations: int = 99,
+            final_checks: int = 0,
+            history_window: int = 10
+    ) -> str:
         """
         Executes the plan (i.e., calls tools as necessary) until an 'end_execution_loop' function call is made.
         Includes an additional confirmation step to ensure the agent is ready to finalize the loop.
+        Only the last `history_window` loop messages are kept verbatim; older ones are
+        folded into a one-line-per-step summary.
         Returns the final summary from the Execution stage.
         """
         logger.info("Execution Stage: Starting execution of the plan.")
         logger.info(f"Execution Stage: Initial plan content:\n{plan_content}")
 
-        # Add system message for Execution
-        self.add_system_message(self.execution_messages, self.EXECUTION_MESSAGE)
-
-        # Add user message for Execution
-        self.add_user_message(self.execution_messages, self.user_input)
+        # Add user message for Execution (the Execution instructions live in the static prefix)
+        self.add_user_message(
+            self.execution_messages, self.user_input, await self._num_tokens_from_string_async(self.user_input)
+        )
 
 
         # Pass the plan content as a system-level message
-        self.add_system_message(self.execution_messages, f"Deliberation Plan: {plan_content}")
+        plan_message = f"Deliberation Plan: {plan_content}"
+        self.add_system_message(
+            self.execution_messages, plan_message, await self._num_tokens_from_string_async(plan_message)
+        )
+
+        # Messages before this index (user input, plan) are never folded into the summary
+        self._execution_loop_start = len(self.execution_messages)
 
         iteration_count = 0
         exit_statement = ""
@@ -433,96 +1058,186 @@ class BaseAgent:
 
             logger.info(f"Execution Stage: Iteration {iteration_count + 1}.")
 
-            try:
-                # Make a call to the model (tools allowed)
-                response = self._call_model(self.execution_messages, use_tools=True)
-                function_name, arguments, _ = self._parse_tool_call(response)
-
-                # Log the response and parsed function call
-                logger.info(f"Model response:\n{response}")
-                logger.info(f"Function call detected: {function_name}, with arguments: {arguments}")
-
-                if not function_name:
-                    # The model returned no function calls, which is not valid under the new rules
-                    warning_message = (
-                        "Warning: You must call the function 'end_execution_loop' to finalize Execution Stage. "
-                        "No function calls were detected in your last response. Please either continue tool usage or "
-                        "call 'end_execution_loop' if you are finished."
-                    )
-                    logger.warning("Execution Stage: No function call detected. Adding warning to system messages.")
-                    self.add_system_message(self.execution_messages, warning_message)
-                    iteration_count += 1
-                    continue
-
-                if function_name == "end_execution_loop":
-                    # The agent is indicating it's done or cannot proceed
-                    logger.info(
-                        "Execution Stage: Detected 'end_execution_loop'. Parsing summary and confirming readiness to exit.")
-                    exit_statement = arguments.get("summary", "")
-                    if not exit_statement:
-                        logger.warning("Execution Stage: No summary provided in 'end_execution_loop' call.")
-                        exit_statement = "No summary provided by end_execution_loop."
-
-                    # Record the assistant message to store the final content
-                    self.add_assistant_message(
-                        self.execution_messages,
-                        f"[end_execution_loop] Summary: {exit_statement}"
-                    )
-
-                    if exit_attempts < final_checks:
-                        # Prompt the agent to confirm if it's ready to exit
-                        confirmation_message = (
-                            f"Confirmation Needed: This is your attempt {exit_attempts} to end the Execution Loop. "
-                            "Are you positive this is the final answer? If so, submit a final `end_execution_loop` call. "
-                            "If not, please continue working to finalize the task.\n"
-                            "HINT: If you have a tool to check your progress, use it!"
-                        )
-                        logger.info("Execution Stage: Adding confirmation message for final checks.")
-                        self.add_system_message(self.execution_messages, confirmation_message)
-                        exit_attempts += 1
-                        iteration_count += 1
-                        continue  # Allow the agent to confirm or continue
-                    else:
-                        break  # Final exit confirmed
+            # Make a call to the model (tools allowed)
+            response = await self._call_model(
+                self.execution_messages,
+                use_tools=True,
+                prefix=self._get_stage_prefix("execution")
+            )
+            tool_calls = self._parse_tool_calls(response)
 
-                else:
-                    # Handle a normal tool call
-                    logger.info(f"Execution Stage: Handling tool call '{function_name}'.")
-                    tool_result = self._handle_specific_tool(function_name, arguments)
-                    logger.info(f"Tool result for '{function_name}': {tool_result}")
+            # Log the response and parsed function calls
+            logger.info(f"Model response:\n{response}")
+            logger.info(f"Function calls detected: {tool_calls}")
 
-                    formatted_result = self._format_tool_result(tool_result)
-                    logger.info(f"Formatted tool result for '{function_name}':\n{formatted_result}")
+            if not tool_calls:
+                # The model returned no function calls, which is not valid under the new rules
+                warning_message = (
+                    "Warning: You must call the function 'end_execution_loop' to finalize Execution Stage. "
+                    "No function calls were detected in your last response. Please either continue tool usage or "
+                    "call 'end_execution_loop' if you are finished."
+                )
+                logger.warning("Execution Stage: No function call detected. Adding warning to system messages.")
+                self.add_system_message(
+                    self.execution_messages, warning_message, await self._num_tokens_from_string_async(warning_message)
+                )
+                iteration_count += 1
+                continue
+
+            # Run all requested tools together and report their results in one message
+            pending_calls = [(name, args) for name, args in tool_calls if name != "end_execution_loop"]
+            if pending_calls:
+                await self._run_tool_calls(pending_calls)
+                # Folding re-counts the summary's tokens, so it runs off the event loop
+                await asyncio.to_thread(self._compact_execution_history, history_window)
+
+            end_arguments = next((args for name, args in tool_calls if name == "end_execution_loop"), None)
+            if end_arguments is not None:
+                # The agent is indicating it's done or cannot proceed
+                logger.info(
+                    "Execution Stage: Detected 'end_execution_loop'. Parsing summary and confirming readiness to exit.")
+                exit_statement = end_arguments.get("summary", "")
+                if not exit_statement:
+                    logger.warning("Execution Stage: No summary provided in 'end_execution_loop' call.")
+                    exit_statement = "No summary provided by end_execution_loop."
+
+                # Record the assistant message to store the final content
+                end_message = f"[end_execution_loop] Summary: {exit_statement}"
+                self.add_assistant_message(
+                    self.execution_messages, end_message, await self._num_tokens_from_string_async(end_message)
+                )
 
-                    # Log the tool usage into the conversation
+                if exit_attempts < final_checks:
+                    # Prompt the agent to confirm if it's ready to exit
+                    confirmation_message = (
+                        f"Confirmation Needed: This is your attempt {exit_attempts} to end the Execution Loop. "
+                        "Are you positive this is the final answer? If so, submit a final `end_execution_loop` call. "
+                        "If not, please continue working to finalize the task.\n"
+                        "HINT: If you have a tool to check your progress, use it!"
+                    )
+                    logger.info("Execution Stage: Adding confirmation message for final checks.")
                     self.add_system_message(
                         self.execution_messages,
-                        f"Function called: {function_name}\n"
-                        f"Arguments passed: {json.dumps(arguments, indent=2)}\n"
-                        f"Result:\n{formatted_result}"
+                        confirmation_message,
+                        await self._num_tokens_from_string_async(confirmation_message)
                     )
-
-            except Exception as e:
-                raise(e)
-                logger.error(f"Execution Stage: Error encountered during iteration {iteration_count + 1}: {e}")
-                self.add_system_message(
-                    self.execution_messages,
-                    f"Error encountered: {str(e)}. Execution will continue if possible."
-                )
+                    exit_attempts += 1
+                    iteration_count += 1
+                    continue  # Allow the agent to confirm or continue
+                else:
+                    break  # Final exit confirmed
 
             iteration_count += 1
             logger.info(f"Execution Stage: Iteration {iteration_count} completed.")
 
         if iteration_count >= max_iterations:
             logger.warning(f"Execution Stage: Maximum iterations ({max_iterations}) reached. Exiting loop.")
+            stop_message = "Execution stopped due to reaching the maximum iteration limit."
             self.add_system_message(
-                self.execution_messages,
-                "Execution stopped due to reaching the maximum iteration limit."
+                self.execution_messages, stop_message, await self._num_tokens_from_string_async(stop_message)
             )
 
         logger.info("Execution Stage: Exiting with summary.")
         logger.info(f"Final exit statement: {exit_statement}")
         return exit_statement
+
+    async def _run_tool_calls(self, calls: List[Tuple[str, dict]]) -> None:
+        """
+        Executes the given tool calls (concurrently if PARALLEL_TOOL_CALLS is set)
+        and records all of their results in a single system message.
+        A failing call is reported as an error result without affecting the others.
+        """
+        logger.info(f"Execution Stage: Handling {len(calls)} tool call(s): {[name for name, _ in calls]}.")
+
+        if self.PARALLEL_TOOL_CALLS:
+            results = await asyncio.gather(
+                *(self._handle_specific_tool_async(name, args) for name, args in calls),
+                return_exceptions=True
+            )
+        else:
+            results = []
+            for name, args in calls:
+                try:
+                    results.append(await self._handle_specific_tool_async(name, args))
+                except Exception as e:
+                    results.append(e)
+
+        result_blocks = []
+        for (function_name, arguments), tool_result in zip(calls, results):
+            if isinstance(tool_result, Exception):
+                logger.error(f"Tool '{function_name}' raised an error: {tool_result}")
+                tool_result = {"error": str(tool_result)}
+            logger.info(f"Tool result for '{function_name}': {tool_result}")
+
+            formatted_result = self._format_tool_result(tool_result)
+            logger.info(f"Formatted tool result for '{function_name}':\n{formatted_result}")
+
+            result_blocks.append(
+                f"Function called: {function_name}\n"
+                f"Arguments passed: {orjson.dumps(arguments, option=orjson.OPT_INDENT_2).decode()}\n"
+                f"Result:\n{formatted_result}"
+            )
+
+        # Log the tool usage into the conversation
+        result_message = "\n\n".join(result_blocks)
+        self.add_system_message(
+            self.execution_messages, result_message, await self._num_tokens_from_string_async(result_message)
+        )
+
+    def _compact_execution_history(self, keep_last: int) -> None:
+        """
+        Once the Execution loop holds more than twice `keep_last` messages, folds all
+        but the last `keep_last` of them into a single "Prior steps summary" message,
+        so per-iteration input stays roughly constant instead of growing every step.
+
+        Folding only at this fixed threshold (about once every `keep_last` messages, not
+        every iteration) keeps the folded prefix stable in between. Each fold costs one
+        prompt-cache miss for the loop history: the static prefix, user input and plan
+        stay cached, and everything after them is re-cached from the new summary on.
+        """
+        start = self._execution_loop_start
+        if len(self.execution_messages) - start <= 2 * keep_last:
+            return
+        self._fold_messages(self.execution_messages, start, len(self.execution_messages) - keep_last)
+
+    def _fold_messages(self, stage_messages: list, start: int, end: int) -> None:
+        """
+        Replaces stage_messages[start:end] with one system message summarizing them
+        via a deterministic template (no model call). An earlier summary at `start`
+        is extended rather than nested.
+        """
+        if end - start < 1:
+            return
+
+        lines = []
+        for message in stage_messages[start:end]:
+            content = message.get("content") or ""
+            if content.startswith(self.PRIOR_STEPS_HEADER):
+                lines.extend(content.splitlines()[1:])
+                continue
+
+            blocks = list(_TOOL_RESULT_BLOCK_RE.finditer(content))
+            if not blocks:
+                first_line = content.strip().splitlines()[0] if content.strip() else ""
+                lines.append(f"- {message.get('role', 'system')} note: {first_line[:120]}")
+                continue
+
+            for block in blocks:
+                arguments = " ".join(block.group("arguments").split())
+                if len(arguments) > 120:
+                    arguments = arguments[:120] + "..."
+                status = "error" if '"error"' in block.group("result") else "ok"
+                lines.append(f"- {block.group('name')}({arguments}) -> {status}")
+
+        summary = self.PRIOR_STEPS_HEADER + "\n" + "\n".join(lines)
+        stage_messages[start:end] = [{"role": "system", "content": summary}]
+
+        ledger = self._token_ledger_for(stage_messages)
+        if ledger is not None:
+            ledger.splice(start, end, [self._num_tokens_from_string(summary)])
+
+        logger.info(f"Folded {end - start} message(s) into a prior-steps summary ({len(lines)} line(s)).")
+
     # -------------------------------------------------------------------------
     # Synthesis Stage
     # -------------------------------------------------------------------------
@@ -540,14 +1255,17 @@ class BaseAgent:
             str: A formatted and human-readable version of the tool result.
         """
         try:
-            # Convert the JSON to a pretty-printed string
-            formatted_result = json.dumps(tool_result, indent=indent)
+            # Convert the JSON to a pretty-printed string (orjson only supports 2-space indents)
+            if indent == 2:
+                raw = orjson.dumps(tool_result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                raw = json.dumps(tool_result, indent=indent).encode("utf-8")
 
-            # Truncate if the result is too long
-            if len(formatted_result) > max_length:
-                formatted_result = formatted_result[:max_length] + "... [truncated]"
+            # Truncate on the raw bytes so only the kept prefix is decoded
+            if len(raw) > max_length:
+                return raw[:max_length].decode("utf-8", errors="ignore") + "... [truncated]"
 
-            return formatted_result
+            return raw.decode("utf-8")
         except (TypeError, ValueError) as e:
             # Handle non-JSON serializable tool results gracefully
             return f"Unable to format tool result: {str(e)}"
@@ -563,3 +1281,11 @@ class BaseAgent:
         """
         # Default behavior: No specific tool handling
         return None
+
+    async def _handle_specific_tool_async(self, function_name: str, arguments: dict):
+        """
+        Async entry point used by the Execution loop. By default runs the (blocking)
+        `_handle_specific_tool` in a worker thread so the event loop stays free;
+        subclasses with native async tools may override this instead.
+        """
+        return await asyncio.to_thread(self._handle_specific_tool, function_name, arguments)
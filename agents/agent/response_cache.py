@@ -0,0 +1,75 @@
+# agents/agent/response_cache.py
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model_name: str, messages: list, tools: Optional[list]) -> str:
+    """
+    Returns a stable hash of everything that determines a model response.
+    """
+    payload = json.dumps([model_name, messages, tools], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=32).hexdigest()
+
+
+class InMemoryResponseCache:
+    """
+    Process-local LRU cache of model responses.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class DiskResponseCache:
+    """
+    On-disk cache of model responses (via the optional `diskcache` package), so
+    hits survive restarts and are shared between threads and processes.
+    """
+
+    def __init__(self, directory: str = ".cache/model_responses"):
+        import diskcache  # Optional dependency
+
+        self.directory = directory
+        self._cache = diskcache.Cache(directory)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value)
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache(kind: str, directory: Optional[str] = None):
+    """
+    Returns the shared response cache for `kind` ("memory" or "disk").
+    """
+    if kind == "memory":
+        return InMemoryResponseCache()
+    if kind == "disk":
+        return DiskResponseCache(directory) if directory else DiskResponseCache()
+    raise ValueError(f"Unknown response cache kind: {kind}")
@@ -0,0 +1,110 @@
+# agents/agent/token_counter.py
+
+import functools
+import logging
+from abc import ABC, abstractmethod
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Size of the slices encoded by `TokenCounter.is_within_limit` before re-checking the budget
+_TOKEN_CHUNK_CHARS = 4096
+
+
+@functools.lru_cache(maxsize=4)
+def _get_encoder(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoding for `encoding_name`, loading its BPE ranks only once per process.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+class TokenCounter(ABC):
+    """
+    Interface for the tokenizer used by agents to budget their prompts.
+    Subclasses implement `count`; `is_within_limit` is derived from it.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """
+        Returns the number of tokens in `text`.
+        """
+
+    def is_within_limit(self, text: str, limit: int) -> bool:
+        """
+        Returns True if `text` encodes to at most `limit` tokens.
+
+        The text is encoded in ~4KB slices (split on whitespace) and the check
+        stops as soon as the running count exceeds `limit`, instead of always
+        encoding the full string.
+        """
+        if limit < 0:
+            return False
+
+        count = 0
+        start = 0
+        while start < len(text):
+            end = min(start + _TOKEN_CHUNK_CHARS, len(text))
+            if end < len(text):
+                split = text.rfind(" ", start, end)
+                if split > start:
+                    end = split
+            count += self.count(text[start:end])
+            if count > limit:
+                return False
+            start = end
+        return True
+
+
+class TiktokenCounter(TokenCounter):
+    """
+    Default counter backed by OpenAI's tiktoken.
+    """
+
+    name = "tiktoken"
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding_name = encoding_name
+
+    def count(self, text: str) -> int:
+        # tiktoken encodings are thread-safe, so every thread shares the cached one
+        return len(_get_encoder(self.encoding_name).encode(text))
+
+
+class HFTokenizersCounter(TokenCounter):
+    """
+    Counter backed by Hugging Face `tokenizers` (Rust BPE). Requires the optional
+    `tokenizers` package and downloads the tokenizer definition on first use.
+    """
+
+    name = "hf-tokenizers"
+
+    def __init__(self, model_id: str = "Xenova/gpt-4o"):
+        from tokenizers import Tokenizer  # Optional dependency
+
+        self.model_id = model_id
+        self._tokenizer = Tokenizer.from_pretrained(model_id)
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter(backend: str = "tiktoken") -> TokenCounter:
+    """
+    Returns the shared counter for `backend` ("tiktoken" or "hf-tokenizers"),
+    creating it on first use. Falls back to tiktoken if the requested backend
+    is unavailable.
+    """
+    if backend == "hf-tokenizers":
+        try:
+            return HFTokenizersCounter()
+        except Exception as e:
+            logger.warning(f"Tokenizer backend '{backend}' unavailable ({e}); falling back to tiktoken.")
+    elif backend != "tiktoken":
+        logger.warning(f"Unknown tokenizer backend '{backend}'; falling back to tiktoken.")
+    return TiktokenCounter()
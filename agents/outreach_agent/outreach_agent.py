@@ -1,5 +1,7 @@
 import os
 import logging
+from typing import Optional
+
 from agents.agent.base_agent import BaseAgent
 from agents.outreach_agent.outreach_tools import OutreachTools
 
@@ -38,34 +40,44 @@ class OutreachAgent(BaseAgent):
         "without deviating from provided instructions."
     )
 
+    # process_email_and_label sends or drafts an email, so tool calls run one at a time
+    PARALLEL_TOOL_CALLS = False
+
     def __init__(
         self,
         api_key: str,
         model_name: str = "gpt-4o-mini",
         outreach_label: str = "default_label",
-        send_mode: bool = False
+        send_mode: bool = False,
+        defer_labels: bool = False,
+        cache: Optional[str] = None
     ):
         """
         Initialize the OutreachAgent.
 
         :param api_key: The API key for your OpenAI-based model (inherited from BaseAgent).
         :param model_name: Which model to use (inherited from BaseAgent).
+        :param defer_labels: Queue labels on `email_tools.pending_labels` for a later batch
+                             request instead of labeling each email as it is processed.
+        :param cache: Response cache for model calls (inherited from BaseAgent): None, "memory" or "disk".
         """
-        super().__init__(api_key=api_key, model_name=model_name)
+        super().__init__(api_key=api_key, model_name=model_name, cache=cache)
 
         logger.info("Initializing OutreachAgent...")
 
-        # 1. Persona & Tools Description
-        self.add_system_message(self.deliberation_messages, self.PERSONA)
-        self.add_system_message(self.execution_messages, self.PERSONA)
+        # PERSONA is part of each stage's cached system prefix (see BaseAgent._get_stage_prefix)
 
-        # 2. Load any optional JSON schema describing the tool definitions
+        # 1. Load any optional JSON schema describing the tool definitions
         script_dir = os.path.dirname(__file__)
         tools_path = os.path.join(script_dir, "outreach_tools.json")
         self.load_tools_from_json(tools_path)
 
-        # 3. Instantiate EmailTools
-        self.email_tools = OutreachTools(outreach_label=outreach_label, send_mode=send_mode)
+        # 2. Instantiate EmailTools
+        self.email_tools = OutreachTools(
+            outreach_label=outreach_label,
+            send_mode=send_mode,
+            defer_labels=defer_labels
+        )
 
         logger.info("OutreachAgent initialized successfully.")
 
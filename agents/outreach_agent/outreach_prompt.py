@@ -1,4 +1,10 @@
 
+# Files attached to every outreach email
+ATTACHMENT_PATHS = [
+    "outreach/email_attachments/2025-Spring-Wholesale-Catalog.pdf",
+    "outreach/email_attachments/2025SprWhoOrdForm.pdf",
+]
+
 AGENT_PROMPT = (
     "You are an OutreachAgent tasked with composing a professional, warm, and HTML-only email for a sales outreach to wholesale customers."
     "Incorporate the following requirements without sounding overly excited and ensure no exclamation points are used.\n\n"
@@ -22,7 +28,7 @@ AGENT_PROMPT = (
 
     "4. **Attachment**:\n"
     "   - It is imperative that you attach the following files."
-    "   - The files to attach are: 'outreach/email_attachments/2025-Spring-Wholesale-Catalog.pdf' and 'outreach/email_attachments/2025SprWhoOrdForm.pdf'\n\n"
+    "   - The files to attach are: " + " and ".join(f"'{path}'" for path in ATTACHMENT_PATHS) + "\n\n"
 
     "5. **Signature**:\n"
     "   - Use the following signature exactly as written (be sure to preserve the blank line between 'Take care,' and 'Derious Vaughn'):\n\n"
@@ -1,11 +1,47 @@
+import base64
+import functools
 import logging
-from typing import List, Optional
+import os
+import threading
+from typing import List, Optional, Tuple
 
-from utils.gmail_client.client import GmailClient
+from utils.gmail_client.client import GmailClient, stat_attachment
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=32)
+def _encoded_attachment(path: str, mtime_ns: int, size: int) -> str:
+    """
+    Returns the base64-encoded (MIME line-wrapped) contents of `path`. Keyed on the
+    file's mtime and size as well, so an edited file is re-read instead of served stale.
+    """
+    with open(path, "rb") as f:
+        return base64.encodebytes(f.read()).decode("ascii")
+
+
+def _attachment_blobs(attachment_paths: Optional[List[str]]) -> List[Tuple[str, str]]:
+    """
+    Returns (filename, base64-encoded content) pairs for `attachment_paths`, encoding each
+    file once per process. Raises FileNotFoundError for a missing attachment.
+    """
+    blobs = []
+    for path in attachment_paths or []:
+        if not path:
+            continue
+        st = stat_attachment(path)
+        blobs.append((os.path.basename(path), _encoded_attachment(path, st.st_mtime_ns, st.st_size)))
+    return blobs
+
+
+def prefetch_attachment(path: str) -> None:
+    """
+    Reads and encodes `path` into the attachment cache ahead of the first email that
+    attaches it. Raises FileNotFoundError if the file does not exist.
+    """
+    _attachment_blobs([path])
+
+
 class OutreachTools:
     """
     A minimal wrapper around GmailClient for specific email workflows.
@@ -13,19 +49,44 @@ class OutreachTools:
     - HTML emails by default.
     - Multiple attachments via a list of file paths.
     - Sending OR saving draft depending on class-wide toggle.
+    - Deferring labels so many messages can be labeled in one batch request.
+    - Sharing a single GmailClient (credentials + discovery document) across instances.
     """
 
-    def __init__(self, outreach_label: str = "default_label", send_mode: bool = False):
+    _client: Optional[GmailClient] = None
+    _client_lock = threading.Lock()
+
+    def __init__(
+        self,
+        outreach_label: str = "default_label",
+        send_mode: bool = False,
+        defer_labels: bool = False,
+    ):
         """
         Initialize OutreachTools with a predefined label for categorizing outreach emails.
 
         Args:
             outreach_label (str): The label to assign to outreach emails.
             send_mode (bool): If True, emails are sent immediately instead of saved as drafts.
+            defer_labels (bool): If True, labels are queued in `pending_labels` and applied
+                later via `apply_labels`, instead of one request per email.
         """
         self.outreach_label = outreach_label
         self.send_mode = send_mode  # <-- NEW TOGGLE
-        self.client = GmailClient()
+        self.defer_labels = defer_labels
+        self.pending_labels: List[Tuple[str, str]] = []
+        self.client = self._get_client()
+
+    @classmethod
+    def _get_client(cls) -> GmailClient:
+        """
+        Returns the process-wide GmailClient, creating it on first use.
+        """
+        if cls._client is None:
+            with cls._client_lock:
+                if cls._client is None:
+                    cls._client = GmailClient()
+        return cls._client
 
     # ----------------------------------------------------------------
     #                 Public Methods (Main Workflow)
@@ -54,44 +115,45 @@ class OutreachTools:
         try:
             if self.send_mode:
                 logger.debug("send_mode=True; attempting to send email immediately.")
-                success = self._send_email(subject, body, to_addrs, attachment_paths)
+                message_id = self._send_email(subject, body, to_addrs, attachment_paths)
                 # If sending failed, raise an exception
-                if not success:
+                if not message_id:
                     raise Exception("Failed to send email.")
 
-                # Once an email is sent, it's in 'Sent' rather than in 'Drafts'
-                message_ids = self._search_messages(f"in:sent subject:{subject}")
-                if not message_ids:
-                    raise Exception("Failed to locate the sent email for labeling.")
-                message_id = message_ids[0]
-
             else:
                 logger.debug("send_mode=False; saving draft email instead.")
-                success = self._save_draft(subject, body, to_addrs, attachment_paths)
-                if not success:
+                message_id = self._save_draft(subject, body, to_addrs, attachment_paths)
+                if not message_id:
                     raise Exception("Failed to save draft.")
 
-                # The newly created draft should appear in 'Drafts'
-                draft_ids = self._search_messages(f"in:drafts subject:{subject}")
-                if not draft_ids:
-                    raise Exception("Failed to locate the saved draft for labeling.")
-                message_id = draft_ids[0]
-
             # Now label the message (draft or sent, depending on mode)
+            action = "Email sent" if self.send_mode else "Draft saved"
+            if self.defer_labels:
+                self.pending_labels.append((message_id, self.outreach_label))
+                logger.debug(f"Email successfully processed (sent or drafted); label queued for {message_id}.")
+                return {"status": f"{action} successfully; label queued to be applied later."}
+
             self._add_label(message_id, self.outreach_label)
             logger.debug("Email successfully processed (sent or drafted) and labeled.")
-
-            return {
-                "status": (
-                    "Email sent and labeled successfully."
-                    if self.send_mode
-                    else "Draft saved and labeled successfully."
-                )
-            }
+            return {"status": f"{action} and labeled successfully."}
         except Exception as e:
             logger.error(f"Error in process_email_and_label: {e}")
             return {"error": str(e)}
 
+    def apply_labels(self, label_requests: List[Tuple[str, str]]) -> List[str]:
+        """
+        Applies queued labels in batch requests (up to 100 messages per round trip).
+
+        Args:
+            label_requests (List[Tuple[str, str]]): (message ID, label name) pairs.
+
+        Returns:
+            List[str]: IDs of the messages that could not be labeled.
+        """
+        return self.client.add_labels_batch(
+            [(msg_id, [label]) for msg_id, label in label_requests]
+        )
+
     # ----------------------------------------------------------------
     #                   Private Helper Methods
     # ----------------------------------------------------------------
@@ -102,7 +164,7 @@ class OutreachTools:
         body: str,
         to_addrs: List[str],
         attachment_paths: Optional[List[str]] = None,
-    ) -> bool:
+    ) -> Optional[str]:
         """
         Saves a draft email (HTML by default) with optional attachments.
 
@@ -113,13 +175,13 @@ class OutreachTools:
             attachment_paths (Optional[List[str]]): List of attachment file paths.
 
         Returns:
-            bool: True if successful, False otherwise.
+            Optional[str]: Message ID of the saved draft, or None on failure.
         """
         return self.client.save_draft(
             to_addrs=to_addrs,
             subject=subject,
             body=body,
-            attachment_paths=attachment_paths
+            attachment_blobs=_attachment_blobs(attachment_paths)
         )
 
     def _send_email(
@@ -128,7 +190,7 @@ class OutreachTools:
         body: str,
         to_addrs: List[str],
         attachment_paths: Optional[List[str]] = None,
-    ) -> bool:
+    ) -> Optional[str]:
         """
         Sends an email (HTML by default) with optional attachments.
 
@@ -139,31 +201,18 @@ class OutreachTools:
             attachment_paths (Optional[List[str]]): List of attachment file paths.
 
         Returns:
-            bool: True if successful, False otherwise.
+            Optional[str]: Message ID of the sent email, or None on failure.
         """
         try:
-            self.client.send_email(
+            return self.client.send_email(
                 to_addrs=to_addrs,
                 subject=subject,
                 body=body,
-                attachment_paths=attachment_paths
+                attachment_blobs=_attachment_blobs(attachment_paths)
             )
-            return True
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
-            return False
-
-    def _search_messages(self, criterion: str) -> List[str]:
-        """
-        Searches messages using a Gmail search criterion.
-
-        Args:
-            criterion (str): Gmail search query.
-
-        Returns:
-            List[str]: List of message IDs matching the criterion.
-        """
-        return self.client.search_messages(criterion)
+            return None
 
     def _add_label(self, msg_id: str, label: str) -> None:
         """
@@ -172,8 +221,9 @@ class OutreachTools:
         Args:
             msg_id (str): ID of the message.
             label (str): Label name to add.
+
+        Raises:
+            RuntimeError: If Gmail did not apply the label.
         """
-        self.client.switch_label(
-            msg_id=msg_id,
-            add_labels=[label]
-        )
\ No newline at end of file
+        if msg_id in self.client.add_labels_batch([(msg_id, [label])]):
+            raise RuntimeError(f"Email processed, but adding label '{label}' to message {msg_id} failed.")
\ No newline at end of file
@@ -1,11 +1,28 @@
-import json
+import asyncio
+import logging
 import os
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+from string import Template
 from typing import Optional
 
+import orjson
 from ndt_logger import initialize_logging
 
 from agents.outreach_agent.outreach_agent import OutreachAgent
-from agents.outreach_agent.outreach_prompt import AGENT_PROMPT
+from agents.outreach_agent.outreach_prompt import AGENT_PROMPT, ATTACHMENT_PATHS
+from agents.outreach_agent.outreach_tools import prefetch_attachment
+
+# Loose shape check for a deliverable address (one '@', a dotted domain, no whitespace)
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+# Recipients marked as sent are journaled to `<recipients_dir>/.email_sent_<run name>.jsonl`
+_JOURNAL_PREFIX = ".email_sent_"
+_JOURNAL_SUFFIX = ".jsonl"
+
+# Queued labels are applied once this many are pending (one full Gmail batch request)
+_LABEL_FLUSH_SIZE = 100
 
 
 class EmailOutreachProcessor:
@@ -22,7 +39,10 @@ class EmailOutreachProcessor:
         stop_time: Optional[int] = None,
         outreach_label: str = "default_label",
         send_mode: bool = False,
-        log_filename: str = "dormant_sales.log"
+        log_filename: str = "dormant_sales.log",
+        concurrency: int = 32,
+        response_cache: Optional[str] = None,
+        index_queue=None
     ):
         """
         Parameters:
@@ -32,12 +52,22 @@ class EmailOutreachProcessor:
         - stop_time (int): (Optional) Hour after which processing stops (e.g. 10 -> 10 AM).
         - outreach_label (str): Label for emails processed.
         - send_mode (bool): If True, mark 'email_sent' as True after "sending".
-        - log_filename (str): Unique log file name for this thread.
+        - log_filename (str): Unique log file name for this processor.
+        - concurrency (int): Maximum number of recipients processed at the same time.
+        - response_cache (str): Cache for the agents' model responses ("disk", "memory" or None,
+          the default). The prompt embeds the full recipient JSON, so hits come from re-running
+          the same recipients: they replay the cached completions (the same email text) instead
+          of calling OpenAI again, while tool calls such as saving the draft still run. To
+          regenerate, pass None or delete the cache directory (.cache/model_responses).
+        - index_queue: (Optional) Queue of recipient indices shared with other processors
+          (e.g. a `multiprocessing.Manager().Queue()`). When given, this processor pulls work
+          from it until it is empty instead of walking [begin_index, end_index) itself.
         """
         self.logger = initialize_logging(
             log_dir='logs',
             log_file=log_filename
         )
+        self._log_listener = self._make_logging_non_blocking(self.logger)
 
         # Treat this as the "database" directory
         self.recipients_dir = recipients_dir
@@ -46,72 +76,353 @@ class EmailOutreachProcessor:
         self.stop_time = stop_time
         self.outreach_label = outreach_label
         self.send_mode = send_mode
+        self.concurrency = concurrency
+        self.response_cache = response_cache
+        self.index_queue = index_queue
         self.openai_api_key = os.environ.get("OPENAI_API_KEY")
 
-    def process_slice(self, prompt: str) -> None:
+        # Indices with a recipient file, from a single directory listing
+        self._available = self._scan_recipients(recipients_dir)
+
+        # Recipients marked as sent are appended to a journal and written back to their
+        # files in one pass by `finalize`. Journals left behind by interrupted runs can list
+        # any recipient, so all of them must be applied before any email goes out: a
+        # standalone processor does that here, while processors sharing an `index_queue`
+        # rely on the caller having run `reconcile_sent_journals` before starting them
+        # (applying them here would race the other processors' sends and open journals).
+        journal_name = os.path.splitext(os.path.basename(log_filename))[0]
+        self._journal_path = os.path.join(recipients_dir, f"{_JOURNAL_PREFIX}{journal_name}{_JOURNAL_SUFFIX}")
+        self._journal = None
+        if send_mode:
+            if index_queue is None:
+                reconcile_sent_journals(recipients_dir, self.logger)
+            self._journal = open(self._journal_path, 'ab')
+
+    async def process_slice(self, prompt: str) -> None:
         """
-        Process recipients in [self.begin_index, self.end_index).
+        Process recipients in [self.begin_index, self.end_index) (or from `self.index_queue`)
+        concurrently on one event loop, with `self.concurrency` workers each pulling the next
+        recipient as soon as it finishes the previous one, so one slow recipient never idles the rest.
         Reads and writes each recipient file independently, so no global file locking is necessary.
         """
         self.logger.info("\n" + "-" * 50 + "\n")
 
-        for i in range(self.begin_index, self.end_index):
-            # Construct the file path for this recipient
-            recipient_file = os.path.join(self.recipients_dir, f"customer_{i}.json")
+        # Compile the prompt into a template once; placeholders are named fields ($recipient),
+        # and any literal '$' in the prompt is escaped
+        prompt_template = Template(prompt.replace("$", "$$").replace("{Insert JSON Here}", "$recipient"))
+
+        # Read and encode the shared attachments before any email needs them
+        await self._prefetch_attachments()
+
+        # Agents are built once and reused (after a conversation reset) across recipients;
+        # there is at most one agent per worker
+        self._agents = []
+        self._idle_agents = asyncio.Queue()
+        self._flushing_labels = False
+
+        indices = iter(range(self.begin_index, self.end_index))
+
+        async def worker():
+            while True:
+                i = await self._next_index(indices)
+                if i is None:
+                    return
+                try:
+                    await self._process_recipient(i, prompt_template)
+                except Exception as e:
+                    self.logger.error(f"Error processing recipient at index {i}: {e}")
+
+                # Apply queued labels a full batch at a time, so an interrupted run loses few of them
+                if not self._flushing_labels and self._pending_label_count() >= _LABEL_FLUSH_SIZE:
+                    self._flushing_labels = True
+                    try:
+                        await asyncio.to_thread(self._flush_labels)
+                    finally:
+                        self._flushing_labels = False
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        # Apply whatever labels are still queued (`run` also does this if the slice is interrupted)
+        await asyncio.to_thread(self._flush_labels)
+
+        self.logger.info("-" * 50 + "\n")
+
+    async def _prefetch_attachments(self) -> None:
+        """
+        Loads the attachments shared by every email into the encoded-attachment cache in
+        parallel worker threads, so no send waits on disk. Checks the paths once up front,
+        rather than failing inside every email.
+        """
+        results = await asyncio.gather(
+            *(asyncio.to_thread(prefetch_attachment, path) for path in ATTACHMENT_PATHS),
+            return_exceptions=True
+        )
+        for path, result in zip(ATTACHMENT_PATHS, results):
+            if isinstance(result, FileNotFoundError):
+                self.logger.warning(f"Attachment not found: {path}. Emails that attach it will fail.")
+            elif isinstance(result, Exception):
+                self.logger.error(f"Failed to prefetch attachment {path}: {result}")
+
+    async def _next_index(self, indices) -> Optional[int]:
+        """
+        Returns the next recipient index to process, or None when there is no work left.
+        Indices come from the shared `index_queue` if one was given, otherwise from `indices`.
+        """
+        if self.index_queue is None:
+            return next(indices, None)
+        return await asyncio.to_thread(self._take_shared_index)
+
+    def _take_shared_index(self) -> Optional[int]:
+        """
+        Takes an index from the shared queue without waiting (run via `asyncio.to_thread`).
+        """
+        try:
+            return self.index_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    async def _acquire_agent(self) -> OutreachAgent:
+        """
+        Returns an idle agent from the pool, constructing a new one if none is free.
+        """
+        try:
+            return self._idle_agents.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+
+        # Construction may build the shared Gmail service (blocking HTTP), so it runs off the event loop
+        agent = await asyncio.to_thread(
+            OutreachAgent,
+            api_key=self.openai_api_key,
+            model_name="gpt-4o-mini",
+            outreach_label=self.outreach_label,
+            send_mode=self.send_mode,
+            defer_labels=True,
+            cache=self.response_cache
+        )
+        self._agents.append(agent)
+        return agent
+
+    def _release_agent(self, agent: OutreachAgent) -> None:
+        """
+        Clears the agent's conversation and returns it to the pool.
+        """
+        agent.reset_conversation()
+        self._idle_agents.put_nowait(agent)
+
+    async def _process_recipient(self, i: int, prompt_template: Template) -> None:
+        """
+        Processes the recipient stored at index `i`, filling `$recipient` in
+        `prompt_template` with the recipient's JSON.
+        """
+        # Construct the file path for this recipient
+        recipient_file = os.path.join(self.recipients_dir, f"customer_{i}.json")
+
+        # If the file doesn't exist, we skip
+        if i not in self._available:
+            self.logger.info(f"No file found for index {i} at {recipient_file}. Skipping.")
+            return
+
+        # Load the recipient data
+        try:
+            recipient = await asyncio.to_thread(self._load_recipient, recipient_file)
+        except Exception as e:
+            self.logger.error(f"Failed to load recipient at index {i}: {e}")
+            return
+
+        # Check if this recipient is already sent
+        if recipient.get("email_sent"):
+            self.logger.info(f"Index {i}: Already marked 'email_sent=True'. Skipping.")
+            return
 
-            # If the file doesn't exist, we skip
-            if not os.path.isfile(recipient_file):
-                self.logger.info(f"No file found for index {i} at {recipient_file}. Skipping.")
-                continue
+        # Skip malformed recipients before spending a model call on them
+        if not self._valid_recipient(recipient):
+            self.logger.warning(f"Index {i}: Missing or invalid 'email' ({recipient.get('email')!r}). Skipping.")
+            return
 
-            # Load the recipient data
+        # Process
+        name = recipient.get("source_name", "UNKNOWN")
+        email = recipient.get("email", "UNKNOWN")
+        self.logger.info(f"Processing index {i}: {name} <{email}>")
+
+        # Construct the personalized prompt
+        personalized_prompt = prompt_template.substitute(recipient=orjson.dumps(recipient).decode("utf-8"))
+
+        # Invoke your email-sending (or generation) agent
+        agent = await self._acquire_agent()
+        try:
+            final_response = await agent.process_user_input_async(personalized_prompt)
+        except Exception as e:
+            self.logger.error(f"Error processing recipient at index {i}: {e}")
+            return
+        finally:
+            self._release_agent(agent)
+        self.logger.info(f"Email to {email}:\n{final_response}")
+        self.logger.info(f"Email successfully processed for: {name}")
+
+        # If send_mode is True, journal the recipient as having an email sent
+        if self.send_mode:
             try:
-                with open(recipient_file, 'r') as f:
-                    recipient = json.load(f)
+                self._journal.write(orjson.dumps({"i": i, "sent": True}) + b"\n")
+                self._journal.flush()
+                self.logger.info(f"Journaled 'email_sent' for index {i}.")
             except Exception as e:
-                self.logger.error(f"Failed to load recipient at index {i}: {e}")
-                continue
+                self.logger.error(f"Failed to journal recipient {i} updates: {e}")
 
-            # Check if this recipient is already sent
-            if recipient.get("email_sent"):
-                self.logger.info(f"Index {i}: Already marked 'email_sent=True'. Skipping.")
-                continue
+    def finalize(self) -> None:
+        """
+        Closes the 'email_sent' journal and writes its entries back to the recipient files.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._apply_journal(self._journal_path, self.recipients_dir, self.logger)
 
-            # Process
+    @classmethod
+    def _apply_journal(cls, journal_path: str, recipients_dir: str, logger: logging.Logger) -> None:
+        """
+        Sets 'email_sent' on every recipient recorded in the journal at `journal_path`
+        (rewriting only those files), then removes the journal.
+        """
+        if not os.path.isfile(journal_path):
+            return
+
+        sent_indices = set()
+        with open(journal_path, 'rb') as journal:
+            for line in journal:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # A partially written final line
+                if entry.get("sent"):
+                    sent_indices.add(entry["i"])
+
+        failed = False
+        for i in sorted(sent_indices):
+            recipient_file = os.path.join(recipients_dir, f"customer_{i}.json")
             try:
-                name = recipient.get("source_name", "UNKNOWN")
-                email = recipient.get("email", "UNKNOWN")
-                self.logger.info(f"Processing index {i}: {name} <{email}>")
-
-                # Construct the personalized prompt
-                personalized_prompt = prompt.replace("{Insert JSON Here}", str(recipient))
-
-                # Invoke your email-sending (or generation) agent
-                agent = OutreachAgent(
-                    api_key=self.openai_api_key,
-                    model_name="gpt-4o-mini",
-                    outreach_label=self.outreach_label,
-                    send_mode=self.send_mode
-                )
-
-                final_response = agent.process_user_input(personalized_prompt)
-                self.logger.info(f"Email to {email}:\n{final_response}")
-                self.logger.info(f"Email successfully processed for: {name}")
-
-                # If send_mode is True, mark the recipient as having an email sent
-                if self.send_mode:
+                recipient = cls._load_recipient(recipient_file)
+                if not recipient.get("email_sent"):
                     recipient["email_sent"] = True
-                    try:
-                        with open(recipient_file, 'w') as f:
-                            json.dump(recipient, f, indent=4)
-                        self.logger.info(f"Updated 'email_sent' for index {i}.")
-                    except Exception as e:
-                        self.logger.error(f"Failed to save recipient {i} updates: {e}")
-
+                    cls._save_recipient(recipient_file, recipient)
+                logger.info(f"Updated 'email_sent' for index {i}.")
             except Exception as e:
-                self.logger.error(f"Error processing recipient at index {i}: {e}")
+                failed = True
+                logger.error(f"Failed to save recipient {i} updates: {e}")
 
-        self.logger.info("-" * 50 + "\n")
+        # Keep the journal if any update failed, so the next run retries it
+        if not failed:
+            os.remove(journal_path)
+
+    @staticmethod
+    def _valid_recipient(recipient: dict) -> bool:
+        """
+        Returns True if the recipient has a usable email address. A missing personal name is
+        fine: the prompt falls back to a generic greeting.
+        """
+        email = recipient.get("email")
+        return isinstance(email, str) and _EMAIL_RE.fullmatch(email.strip()) is not None
+
+    @staticmethod
+    def _scan_recipients(recipients_dir: str) -> set:
+        """
+        Returns the indices of all `customer_<i>.json` files in `recipients_dir`.
+        """
+        available = set()
+        try:
+            with os.scandir(recipients_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith("customer_") and name.endswith(".json") and entry.is_file():
+                        index = name[len("customer_"):-len(".json")]
+                        if index.isdigit():
+                            available.add(int(index))
+        except FileNotFoundError:
+            pass
+        return available
+
+    @staticmethod
+    def _load_recipient(recipient_file: str) -> dict:
+        """
+        Reads a recipient JSON file (run via `asyncio.to_thread`).
+        """
+        with open(recipient_file, 'rb') as f:
+            return orjson.loads(f.read())
+
+    @staticmethod
+    def _save_recipient(recipient_file: str, recipient: dict) -> None:
+        """
+        Writes a recipient JSON file atomically.
+        """
+        # Write to a temporary file and swap it in, so an interrupted write never leaves a partial file
+        tmp_file = f"{recipient_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(recipient, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, recipient_file)
+
+    def _pending_label_count(self) -> int:
+        """
+        Returns how many labels the agents have queued and not yet applied.
+        """
+        return sum(len(agent.email_tools.pending_labels) for agent in getattr(self, "_agents", []))
+
+    def _take_pending_labels(self) -> list:
+        """
+        Removes and returns the labels queued on every agent. Only the entries present
+        when each list is read are removed, so labels appended concurrently are kept.
+        """
+        pending_labels = []
+        for agent in getattr(self, "_agents", []):
+            queued = agent.email_tools.pending_labels
+            count = len(queued)
+            pending_labels.extend(queued[:count])
+            del queued[:count]
+        return pending_labels
+
+    def _flush_labels(self) -> None:
+        """
+        Applies the labels queued while processing the slice, up to 100 messages per Gmail batch request.
+        """
+        pending_labels = self._take_pending_labels()
+        if not pending_labels:
+            return
+
+        email_tools = self._agents[0].email_tools
+        self.logger.info(f"Applying label '{self.outreach_label}' to {len(pending_labels)} messages.")
+        try:
+            failed = email_tools.apply_labels(pending_labels)
+        except Exception as e:
+            self.logger.error(f"Failed to apply labels: {e}")
+            return
+        if failed:
+            self.logger.error(f"Failed to label {len(failed)} messages: {failed}")
+
+    @staticmethod
+    def _make_logging_non_blocking(logger: logging.Logger) -> Optional[QueueListener]:
+        """
+        Moves the logger's handlers (e.g. the log file) behind a QueueListener thread and
+        gives the logger a single QueueHandler, so logging calls only enqueue the record.
+        Returns the started listener (stop it with `close`), or None if there is nothing to wrap.
+        """
+        handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+        if not handlers:
+            return None
+
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(log_queue))
+        listener.start()
+        return listener
+
+    def close(self) -> None:
+        """
+        Flushes queued log records to their handlers and stops the logging thread.
+        """
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
 
     def run(self, prompt: str) -> None:
         """
@@ -121,11 +432,41 @@ class EmailOutreachProcessor:
 
         # (Optional) You could enforce stop_time checks here if desired.
 
-        self.process_slice(prompt)
+        async def _run_slice():
+            try:
+                await self.process_slice(prompt)
+            finally:
+                # Close the loop's shared OpenAI HTTP client before asyncio.run tears the loop down
+                await OutreachAgent.aclose_http_client()
+
+        try:
+            asyncio.run(_run_slice())
+        finally:
+            # Labels still queued by an interrupted slice would otherwise be lost
+            self._flush_labels()
+            self.finalize()
 
         self.logger.info("Email outreach process completed.")
 
 
+def reconcile_sent_journals(recipients_dir: str, logger: Optional[logging.Logger] = None) -> None:
+    """
+    Applies every 'email_sent' journal in `recipients_dir` (whichever processor wrote it)
+    to the recipient files. Must run before any processor starts sending, and while none
+    is running, so recipients journaled by an interrupted run are never emailed twice.
+    """
+    logger = logger or logging.getLogger(__name__)
+    try:
+        names = sorted(os.listdir(recipients_dir))
+    except FileNotFoundError:
+        return
+
+    for name in names:
+        if name.startswith(_JOURNAL_PREFIX) and name.endswith(_JOURNAL_SUFFIX):
+            logger.info(f"Applying 'email_sent' journal {name}.")
+            EmailOutreachProcessor._apply_journal(os.path.join(recipients_dir, name), recipients_dir, logger)
+
+
 def run_processor(
     name: str,
     recipients_dir: str,
@@ -134,15 +475,19 @@ def run_processor(
     stop_time: int,
     outreach_label: str,
     send_mode: bool,
-    log_file_prefix: str
+    log_file_prefix: str,
+    concurrency: int = 32,
+    response_cache: Optional[str] = None,
+    index_queue=None
 ):
     """
-    This function is the 'target' for each thread. It creates and runs an
-    EmailOutreachProcessor with the given arguments.
+    Creates and runs an EmailOutreachProcessor with the given arguments,
+    processing up to `concurrency` recipients at a time on a single event loop.
+    If `index_queue` is given, recipients are pulled from it (shared with other processes).
     """
-    print(f"[{name}] Thread starting...")
+    print(f"[{name}] Processor starting...")
 
-    # Create a unique log filename for this thread
+    # Create a unique log filename for this run
     log_filename = f"{log_file_prefix}_{name}.log"
 
     processor = EmailOutreachProcessor(
@@ -152,11 +497,17 @@ def run_processor(
         stop_time=stop_time,
         outreach_label=outreach_label,
         send_mode=send_mode,
-        log_filename=log_filename  # Pass unique log filename for this thread
+        log_filename=log_filename,
+        concurrency=concurrency,
+        response_cache=response_cache,
+        index_queue=index_queue
     )
 
     # Run the outreach process with a shared prompt
-    processor.run(AGENT_PROMPT)
+    try:
+        processor.run(AGENT_PROMPT)
+    finally:
+        processor.close()
 
-    print(f"[{name}] Thread finished.")
+    print(f"[{name}] Processor finished.")
 
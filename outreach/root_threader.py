@@ -1,5 +1,8 @@
-import threading
-from outreach.email_outreach_processor import run_processor
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from outreach.email_outreach_processor import reconcile_sent_journals, run_processor
 
 ###############################################################################
 # GLOBAL CONFIGURATIONS
@@ -14,88 +17,76 @@ GLOBAL_CONFIG = {
     # If True, the EmailAgent will send emails; if False, it will save as drafts
     "send_mode": False, # Reset this to False after every run.
 
-    # Prefix for log filenames (threads will append their name to this)
+    # Prefix for log filenames (the run name is appended to this)
     "log_file_prefix": "dormant_sales",
 
-    "stop_time": 20 # legacy arg, for when I needed this program to stop at a particular time
-}
+    "stop_time": 20, # legacy arg, for when I needed this program to stop at a particular time
 
-###############################################################################
-# THREAD-SPECIFIC CONFIGS
-# Each thread will process a specific slice of the recipients list.
-###############################################################################
-THREADS_CONFIG = [
-    {
-        "name": "T1",
-        "begin_index": 1,
-        "end_index": 2
-    },
-    {
-        "name": "T2",
-        "begin_index": 2,
-        "end_index": 3
-    },
-    {
-        "name": "T3",
-        "begin_index": 3,
-        "end_index": 4
-    },
-    {
-        "name": "T4",
-        "begin_index":4,
-        "end_index": 5
-    },
-    {
-        "name": "T5",
-        "begin_index": 5,
-        "end_index": 6
-    },
-
-]
+    # Recipients to process: [begin_index, end_index)
+    "begin_index": 1,
+    "end_index": 6,
+
+    # Number of worker processes sharing the recipient queue (None -> one per CPU)
+    "processes": None,
+
+    # Maximum number of recipients processed at the same time by each process
+    "concurrency": 32,
+
+    # Cache model responses ("disk" or "memory"); None (the default) always calls OpenAI.
+    # The cache key includes the recipient's JSON, so it only helps when re-running the
+    # same recipients, and then replays their previous emails verbatim. To regenerate them,
+    # set this back to None or delete .cache/model_responses.
+    "response_cache": None
+}
 
 ###############################################################################
 # LOGIC
 ###############################################################################
 
 def main():
-    # Extract global settings for easy reuse
-    recipients_dir = GLOBAL_CONFIG["recipients_dir"]
-    stop_time = GLOBAL_CONFIG["stop_time"]
-    outreach_label = GLOBAL_CONFIG["outreach_label"]
-    send_mode = GLOBAL_CONFIG["send_mode"]
-    log_file_prefix = GLOBAL_CONFIG["log_file_prefix"]
-
-    # Create a list to keep references to all threads
-    threads = []
-
-    # Build and start a thread for each slice
-    for config in THREADS_CONFIG:
-        t = threading.Thread(
-            target=run_processor,
-            args=(
-                config["name"],
-                recipients_dir,
-                config["begin_index"],
-                config["end_index"],
-                stop_time,
-                outreach_label,
-                send_mode,
-                log_file_prefix  # Pass the global log file prefix
-            ),
-            name=config["name"]  # name the thread for easier debugging
-        )
-        threads.append(t)
-
-    # Start all threads
-    for t in threads:
-        t.start()
-
-    # Wait for all threads to complete before exiting main
-    for t in threads:
-        t.join()
-
-    print("All threads have finished.")
+    begin_index = GLOBAL_CONFIG["begin_index"]
+    end_index = GLOBAL_CONFIG["end_index"]
+    processes = min(GLOBAL_CONFIG["processes"] or os.cpu_count() or 1, max(1, end_index - begin_index))
+
+    # Journals from an interrupted run can list any recipient (the queue is shared), so
+    # apply all of them before any process starts pulling indices and sending
+    if GLOBAL_CONFIG["send_mode"]:
+        reconcile_sent_journals(GLOBAL_CONFIG["recipients_dir"])
+
+    with multiprocessing.Manager() as manager:
+        # Shared work queue: each process pulls the next recipient when it has capacity,
+        # so a slow recipient never leaves the other processes idle
+        index_queue = manager.Queue()
+        for i in range(begin_index, end_index):
+            index_queue.put(i)
+
+        # Each worker process owns its interpreter (no GIL contention on JSON/SDK work)
+        # and processes recipients concurrently on its own event loop
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(
+                    run_processor,
+                    f"P{n + 1}",
+                    GLOBAL_CONFIG["recipients_dir"],
+                    begin_index,
+                    end_index,
+                    GLOBAL_CONFIG["stop_time"],
+                    GLOBAL_CONFIG["outreach_label"],
+                    GLOBAL_CONFIG["send_mode"],
+                    GLOBAL_CONFIG["log_file_prefix"],
+                    concurrency=GLOBAL_CONFIG["concurrency"],
+                    response_cache=GLOBAL_CONFIG["response_cache"],
+                    index_queue=index_queue
+                )
+                for n in range(processes)
+            ]
+
+            # Wait for every process, surfacing any worker failure
+            for future in futures:
+                future.result()
+
+    print("All recipients have been processed.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
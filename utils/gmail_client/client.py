@@ -1,21 +1,40 @@
 import os
 import os.path
-from typing import List, Dict, Optional
+import random
+import re
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import List, Dict, Optional, Tuple
 
 import html
 
 from google.auth.exceptions import RefreshError
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+import httplib2
+from requests.adapters import HTTPAdapter
 
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
-from email import encoders
+from email.generator import BytesGenerator
 import base64
+import io
+
+try:
+    import fcntl
+except ImportError:  # Windows: token writes are still atomic, just not serialized
+    fcntl = None
 
 import logging
 
@@ -31,22 +50,280 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.labels",
 ]
 
+TOKEN_PATH = "utils/gmail_client/config/token.json"
+
+# Attachments are read and base64-encoded in slices of this size; a multiple of
+# 57 bytes (one 76-character base64 line) so the slices join into valid MIME lines.
+_BASE64_CHUNK_BYTES = 57 * 1024
+
+# Messages with attachments, or larger than this many bytes, are sent as a binary
+# media upload rather than base64-inlined into the JSON `raw` field.
+_MEDIA_UPLOAD_THRESHOLD = 1024 * 1024
+
+# Size of the shared keep-alive connection pool used for Gmail API calls
+_HTTP_POOL_SIZE = 64
+
+# (connect, read) timeout in seconds for every Gmail API request, so a stalled
+# connection fails and is retried instead of hanging its worker thread
+_HTTP_TIMEOUT = (10, 60)
+
+# Messages that a batch request could not fetch because of rate limiting are retried
+# one by one on this many threads, with jittered exponential backoff
+_RETRY_WORKERS = 10
+_RATE_LIMIT_RETRIES = 5
+_BACKOFF_BASE_SECONDS = 1.0
+
+# Gmail's maximum `maxResults` for messages.list
+_SEARCH_PAGE_SIZE = 500
+
+# Line printed after each message by `GmailClient.format_thread`
+_THREAD_SEPARATOR = "-" * 40
+
+# Credentials are refreshed in the background once they are this close to expiring
+_TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# Markers that start quoted reply/forward text in a snippet (see GmailClient._trim_snippet)
+_SNIPPET_MARKER_RE = re.compile(r"On |wrote:|From:|Subject:", re.IGNORECASE)
+
+# The only headers read from message resources, keyed by Gmail's canonical casing
+_WANTED_HEADERS = {"Subject": "subject", "From": "from", "Date": "date", "To": "to"}
+_WANTED = frozenset(_WANTED_HEADERS.values())
+
+
+def stat_attachment(path: str) -> os.stat_result:
+    """
+    Returns the stat of attachment `path` (one syscall), raising FileNotFoundError
+    if it is missing or not a regular file.
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        raise FileNotFoundError(f"Attachment path is invalid: {path}")
+    return st
+
+
+@contextmanager
+def _token_file_lock(token_path: str):
+    """
+    Holds an exclusive lock on `<token_path>.lock` (where `fcntl` is available), so
+    processes sharing one token file refresh and write it one at a time.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{token_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class _SessionHttp:
+    """
+    Minimal httplib2.Http-compatible adapter over a google-auth AuthorizedSession,
+    so the discovery client sends requests through urllib3's thread-safe keep-alive
+    pool (one TLS handshake per pooled connection, shared by every thread) instead
+    of httplib2's per-instance connections.
+    """
+
+    def __init__(self, session: AuthorizedSession, timeout: Optional[Tuple[float, float]] = None):
+        self.session = session
+        self.timeout = timeout
+
+    @property
+    def credentials(self) -> Credentials:
+        # Lets googleapiclient authorize the parts of a batch request
+        return self.session.credentials
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        response = self.session.request(
+            method, uri, data=body, headers=headers, timeout=self.timeout
+        )
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self) -> None:
+        self.session.close()
+
 
 class GmailClient:
     def __init__(self):
         """
         Initializes the GmailClient by loading or acquiring credentials,
         and building a service instance.
+
+        Requests go through one AuthorizedSession whose connection pool is shared by
+        all threads, so one client (and its discovery document) serves every thread
+        and TLS connections are reused between calls.
         """
         self.creds = self._get_credentials()
-        self.service = build("gmail", "v1", credentials=self.creds)
+        # Serializes refreshes of `self.creds` between the background refresher and inline
+        # refreshes by the session or googleapiclient (see `_serialize_refreshes`)
+        self._creds_lock = threading.RLock()
+        self._serialize_refreshes()
+        self._http = self._build_http()
+
+        # Refresh the token before it expires so API calls never wait on an inline refresh
+        self._stop_refresh = threading.Event()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="gmail-token-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+        # Case-folded label name -> label ID, loaded on first use (see `_get_or_create_label`)
+        self._label_cache: Optional[Dict[str, str]] = None
+        self._label_lock = threading.Lock()
+        self.service = build(
+            "gmail",
+            "v1",
+            http=self._http
+        )
+
+    def _build_http(self) -> _SessionHttp:
+        """
+        Returns the shared authorized transport for the Gmail service.
+        """
+        session = AuthorizedSession(self.creds)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        return _SessionHttp(session, timeout=_HTTP_TIMEOUT)
+
+    def _serialize_refreshes(self) -> None:
+        """
+        Wraps `self.creds.refresh` so every refresh, whether from the background thread,
+        the AuthorizedSession (expired token or 401) or googleapiclient, runs under
+        `self._creds_lock`. A caller that waited on the lock while another thread
+        refreshed skips its own refresh and uses the new token.
+        """
+        refresh = self.creds.refresh
+
+        def _locked_refresh(request):
+            stale_token = self.creds.token
+            with self._creds_lock:
+                if self.creds.token != stale_token:
+                    return
+                refresh(request)
+
+        self.creds.refresh = _locked_refresh
+
+    @staticmethod
+    def _seconds_until_expiry(creds: Credentials) -> Optional[float]:
+        """
+        Returns how many seconds remain before `creds` expires, or None if it has no expiry.
+        """
+        if not creds.expiry:
+            return None
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (creds.expiry - now).total_seconds()
+
+    @staticmethod
+    def _save_credentials(creds: Credentials, token_path: str) -> bool:
+        """
+        Writes `creds` to `token_path` atomically (fsynced, uniquely named temp file +
+        rename), so neither a concurrent reader or writer nor a crash mid-write leaves a
+        truncated token file behind. Skips the write if the file already holds the same token.
+
+        :return: True if the file was written.
+        """
+        token_json = creds.to_json()
+        try:
+            with open(token_path, "r") as token_file:
+                if token_file.read() == token_json:
+                    return False
+        except OSError:
+            pass
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(token_path) or ".", prefix=".token-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as token_file:
+                token_file.write(token_json)
+                token_file.flush()
+                os.fsync(token_file.fileno())
+            os.replace(tmp_path, token_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return True
+
+    def _adopt_saved_token(self, token_path: str) -> bool:
+        """
+        Takes over the access token in `token_path` if another process has already
+        refreshed it (it is not within the refresh margin of expiring), so only one of
+        the processes sharing the file calls the token endpoint.
+
+        :return: True if the saved token was adopted.
+        """
+        try:
+            saved = Credentials.from_authorized_user_file(token_path, SCOPES)
+        except Exception:
+            return False
+        remaining = self._seconds_until_expiry(saved)
+        if not saved.token or remaining is None or remaining <= _TOKEN_REFRESH_MARGIN_SECONDS:
+            return False
+        # Update in place: the authorized session holds this credentials object
+        self.creds.token = saved.token
+        self.creds.expiry = saved.expiry
+        return True
+
+    def _refresh_loop(self) -> None:
+        """
+        Background thread: sleeps until the token is within `_TOKEN_REFRESH_MARGIN_SECONDS`
+        of expiring, refreshes it and saves it, then reschedules from the new expiry.
+        The refresh holds the credentials lock (shared with inline refreshes) and the token
+        file lock; a process that finds the file already refreshed by another one adopts
+        that token instead of refreshing again.
+        Requests still refresh inline if this thread falls behind (e.g. clock skew).
+        """
+        while True:
+            remaining = self._seconds_until_expiry(self.creds)
+            if remaining is None or not self.creds.refresh_token:
+                return
+            # Floor the delay so a short-lived or skewed token can't make this spin
+            delay = max(30.0, remaining - _TOKEN_REFRESH_MARGIN_SECONDS)
+            if self._stop_refresh.wait(delay):
+                return
+
+            try:
+                with self._creds_lock, _token_file_lock(TOKEN_PATH):
+                    if self._adopt_saved_token(TOKEN_PATH):
+                        logger.info("Loaded credentials refreshed by another process.")
+                    else:
+                        self.creds.refresh(Request())
+                        self._save_credentials(self.creds, TOKEN_PATH)
+                        logger.info("Refreshed credentials ahead of expiry.")
+            except Exception as e:
+                logger.error("Background token refresh failed: %s", e)
+                # Retry shortly; requests fall back to refreshing inline meanwhile
+                if self._stop_refresh.wait(60):
+                    return
+
+    def close(self) -> None:
+        """
+        Stops the background token refresher and closes pooled connections.
+        """
+        self._stop_refresh.set()
+        self._http.close()
 
     def _get_credentials(self):
         """
         Acquires OAuth credentials from utils/gmail_client/config/token.json (if valid),
         otherwise runs the OAuth flow to generate a new token.json.
         """
-        token_path = "utils/gmail_client/config/token.json"
+        token_path = TOKEN_PATH
         creds = None
 
         # Load existing token if it exists
@@ -57,9 +334,14 @@ class GmailClient:
                 logger.error("Error loading credentials: %s", e)
                 creds = None
 
+        # Treat a token that is about to expire like an expired one, so the first API calls
+        # don't have to refresh it inline
+        remaining = self._seconds_until_expiry(creds) if creds else None
+        expiring = remaining is not None and remaining < _TOKEN_REFRESH_MARGIN_SECONDS
+
         # If credentials don't exist or are invalid, attempt to refresh or reauthenticate.
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
+        if not creds or not creds.valid or expiring:
+            if creds and (creds.expired or expiring) and creds.refresh_token:
                 try:
                     creds.refresh(Request())
                     logger.info("Successfully refreshed credentials.")
@@ -80,8 +362,8 @@ class GmailClient:
                 creds = flow.run_local_server(port=0)
             # Save the credentials for the next run.
             try:
-                with open(token_path, "w") as token_file:
-                    token_file.write(creds.to_json())
+                with _token_file_lock(token_path):
+                    self._save_credentials(creds, token_path)
                 logger.info("Saved new credentials to %s", token_path)
             except Exception as e:
                 logger.error("Failed to save credentials: %s", e)
@@ -93,9 +375,10 @@ class GmailClient:
         Returns a list of mailbox (label) names in the user's Gmail.
         """
         try:
-            response = self.service.users().labels().list(userId="me").execute()
-            labels = response.get("labels", [])
-            return [label["name"] for label in labels]
+            response = self.service.users().labels().list(
+                userId="me", fields="labels/name"
+            ).execute()
+            return list(map(itemgetter("name"), response.get("labels", [])))
         except HttpError as error:
             logger.debug(f"An error occurred while listing labels: {error}")
             return []
@@ -105,7 +388,7 @@ class GmailClient:
         Searches messages using a Gmail query (e.g., 'label:INBOX from:someone').
         Returns a list of message IDs that match the search criterion.
 
-        Handles Gmail's 100-message pagination limit.
+        Handles Gmail's pagination, requesting up to 500 IDs (the API maximum) per page.
 
         :param search_criterion: Gmail search query (e.g., 'label:INBOX from:someone').
         :param max_results: Optional limit on the number of message IDs to return.
@@ -117,15 +400,20 @@ class GmailClient:
 
         try:
             while True:
+                # Request no more than is still needed, up to the API max of 500 per page
+                page_size = _SEARCH_PAGE_SIZE
+                if max_results:
+                    page_size = min(page_size, max_results - len(message_ids))
+
                 response = self.service.users().messages().list(
                     userId="me",
                     q=query,
-                    maxResults=100,  # Gmail max limit per request
-                    pageToken=next_page_token
+                    maxResults=page_size,
+                    pageToken=next_page_token,
+                    fields="messages/id,nextPageToken"
                 ).execute()
 
-                messages = response.get("messages", [])
-                message_ids.extend([msg["id"] for msg in messages])
+                message_ids.extend(map(itemgetter("id"), response.get("messages", [])))
 
                 # Stop if we reach the max_results limit
                 if max_results and len(message_ids) >= max_results:
@@ -148,93 +436,291 @@ class GmailClient:
         Fetches a single message by ID. Returns a dictionary containing
         commonly used fields (subject, from, date, snippet, etc.).
         """
-        try:
-            message = self.service.users().messages().get(
-                userId="me",
-                id=msg_id,
-                format="metadata",
-                metadataHeaders=["Subject", "From", "Date", "To"]
-            ).execute()
+        return self.fetch_messages([msg_id]).get(msg_id, {})
 
-            headers = message.get("payload", {}).get("headers", [])
-            header_map = {h["name"].lower(): h["value"] for h in headers}
-            snippet = message.get("snippet", "")
-
-            return {
-                "id": msg_id,
-                "subject": header_map.get("subject", ""),
-                "from": header_map.get("from", ""),
-                "date": header_map.get("date", ""),
-                "to": header_map.get("to", ""),
-                "snippet": snippet,
-            }
-        except HttpError as error:
-            logger.debug(f"An error occurred while fetching message {msg_id}: {error}")
-            return {}
+    def _message_metadata_request(self, msg_id: str):
+        """
+        Builds the metadata-format messages.get request used by `fetch_messages`.
+        """
+        return self.service.users().messages().get(
+            userId="me",
+            id=msg_id,
+            format="metadata",
+            metadataHeaders=["Subject", "From", "Date", "To"],
+            fields="id,snippet,payload/headers"
+        )
+
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """
+        Returns True if `error` is Gmail's per-user/per-request rate limit response.
+        """
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        content = error.content or b""
+        return error.resp.status == 403 and (
+            b"rateLimitExceeded" in content or b"userRateLimitExceeded" in content
+        )
 
-    def _remove_labels(self, msg_id: str, labels: List[str]):
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
         """
-        Private method to remove labels from a message.
+        Returns the jittered exponential backoff delay for retry number `attempt`.
         """
-        try:
-            label_ids = [self._get_or_create_label(lbl) for lbl in labels]
-            logger.debug(f"Removing labels from message {msg_id}: {labels} -> IDs: {label_ids}")
-            self.service.users().messages().modify(
-                userId="me",
-                id=msg_id,
-                body={"removeLabelIds": label_ids}
-            ).execute()
-            logger.debug(f"Labels {labels} successfully removed from message {msg_id}.")
-        except HttpError as error:
-            logger.debug(f"An error occurred while removing labels from message {msg_id}: {error}")
+        return _BACKOFF_BASE_SECONDS * 2 ** attempt + random.uniform(0, _BACKOFF_BASE_SECONDS)
 
-    def _add_labels(self, msg_id: str, labels: List[str]):
+    def _fetch_message_with_backoff(self, msg_id: str) -> Optional[Dict[str, str]]:
+        """
+        Fetches one message's metadata, backing off and retrying while rate limited.
+        Returns None if it could not be fetched.
+        """
+        for attempt in range(_RATE_LIMIT_RETRIES):
+            try:
+                response = self._message_metadata_request(msg_id).execute()
+                return self._summarize_message(msg_id, response)
+            except HttpError as error:
+                if not self._is_rate_limited(error) or attempt == _RATE_LIMIT_RETRIES - 1:
+                    logger.debug(f"An error occurred while fetching message {msg_id}: {error}")
+                    return None
+                time.sleep(self._backoff_delay(attempt))
+        return None
+
+    def fetch_messages(self, msg_ids: List[str], batch_size: int = 100) -> Dict[str, Dict[str, str]]:
+        """
+        Fetches many messages by ID, sending up to `batch_size` metadata requests per
+        Gmail batch request (one HTTP round trip each) instead of one request per message.
+        Returns a dictionary mapping each successfully fetched ID to the same fields as
+        `fetch_message`; messages that could not be fetched are omitted.
+
+        Messages the batch reports as rate limited (or every message of a batch that
+        failed outright) are retried individually on a small thread pool with jittered
+        exponential backoff, rather than resending whole batches.
+        """
+        results = {}
+        retry_ids = {}  # insertion-ordered set, so an ID is never queued twice
+
+        def _on_response(request_id, response, exception):
+            if exception is not None:
+                if self._is_rate_limited(exception):
+                    retry_ids[request_id] = None
+                    return
+                logger.debug(f"An error occurred while fetching message {request_id}: {exception}")
+                return
+            results[request_id] = self._summarize_message(request_id, response)
+
+        unique_ids = list(dict.fromkeys(msg_ids))
+        rate_limited = False
+        for batch_number, start in enumerate(range(0, len(unique_ids), batch_size)):
+            # Ease off before the next batch if Gmail rate limited the previous one
+            if rate_limited:
+                time.sleep(self._backoff_delay(0))
+            retries_before = len(retry_ids)
+
+            chunk = unique_ids[start:start + batch_size]
+            batch = self.service.new_batch_http_request(callback=_on_response)
+            for msg_id in chunk:
+                batch.add(self._message_metadata_request(msg_id), request_id=msg_id)
+            try:
+                batch.execute()
+            except HttpError as error:
+                logger.debug(f"Batch {batch_number} failed, retrying its messages individually: {error}")
+                retry_ids.update(dict.fromkeys(msg_id for msg_id in chunk if msg_id not in results))
+            rate_limited = len(retry_ids) > retries_before
+
+        if retry_ids:
+            retry_list = list(retry_ids)
+            with ThreadPoolExecutor(max_workers=_RETRY_WORKERS) as executor:
+                for msg_id, summary in zip(retry_list, executor.map(self._fetch_message_with_backoff, retry_list)):
+                    if summary is not None:
+                        results[msg_id] = summary
+
+        return results
+
+    @staticmethod
+    def _extract_headers(headers: List[dict]) -> Dict[str, str]:
+        """
+        Returns the subject/from/date/to headers keyed by lowercase name ("" when
+        absent). Stops scanning as soon as all four are found, and skips the rest of
+        the (often dozens of) headers instead of lowercasing them all.
+        """
+        out = dict.fromkeys(_WANTED, "")
+        found = set()
+        for h in headers:
+            name = h["name"]
+            key = _WANTED_HEADERS.get(name)
+            if key is None:
+                # Non-canonical casing (e.g. "SUBJECT"); only short names can match
+                if len(name) > 7:
+                    continue
+                key = name.lower()
+                if key not in _WANTED:
+                    continue
+            if key in found:
+                continue
+            out[key] = h["value"]
+            found.add(key)
+            if len(found) == len(_WANTED):
+                break
+        return out
+
+    @staticmethod
+    def _summarize_message(msg_id: str, message: dict) -> Dict[str, str]:
+        """
+        Extracts the commonly used fields from a metadata-format message resource.
+        """
+        header_map = GmailClient._extract_headers(message.get("payload", {}).get("headers", []))
+        snippet = message.get("snippet", "")
+
+        return {
+            "id": msg_id,
+            "subject": header_map["subject"],
+            "from": header_map["from"],
+            "date": header_map["date"],
+            "to": header_map["to"],
+            "snippet": snippet,
+        }
+
+    def _get_thread_id(self, msg_id: str) -> Optional[str]:
+        """
+        Returns the thread ID of a message, fetching only its minimal metadata
+        (IDs and labels) rather than the full message.
+        """
+        message = self.service.users().messages().get(
+            userId="me", id=msg_id, format="minimal", fields="threadId"
+        ).execute()
+        return message.get("threadId")
+
+    def _modify_labels_request(
+            self,
+            msg_id: str,
+            add_label_ids: Optional[List[str]] = None,
+            remove_label_ids: Optional[List[str]] = None,
+    ):
         """
-        Private method to add labels to a message.
+        Private method building a single modify request that adds and removes labels (by ID) on a message.
+        """
+        return self.service.users().messages().modify(
+            userId="me",
+            id=msg_id,
+            body={"addLabelIds": add_label_ids or [], "removeLabelIds": remove_label_ids or []}
+        )
+
+    def _modify_labels(
+            self,
+            msg_id: str,
+            add_label_ids: Optional[List[str]] = None,
+            remove_label_ids: Optional[List[str]] = None,
+    ) -> bool:
+        """
+        Private method to add and remove labels (by ID) on a message in one modify call.
+        Returns True if the call succeeded.
         """
         try:
-            label_ids = [self._get_or_create_label(lbl) for lbl in labels]
-            logger.debug(f"Adding labels to message {msg_id}: {labels} -> IDs: {label_ids}")
-            self.service.users().messages().modify(
-                userId="me",
-                id=msg_id,
-                body={"addLabelIds": label_ids}
-            ).execute()
-            logger.debug(f"Labels {labels} successfully added to message {msg_id}.")
+            logger.debug(f"Modifying labels on message {msg_id}: add {add_label_ids or []}, remove {remove_label_ids or []}")
+            self._modify_labels_request(msg_id, add_label_ids, remove_label_ids).execute()
+            logger.debug(f"Labels successfully modified on message {msg_id}.")
+            return True
         except HttpError as error:
-            logger.debug(f"An error occurred while adding labels to message {msg_id}: {error}")
+            logger.debug(f"An error occurred while modifying labels on message {msg_id}: {error}")
+            return False
+
+    def add_labels_batch(
+            self,
+            label_requests: List[Tuple[str, List[str]]],
+            batch_size: int = 100,
+    ) -> List[str]:
+        """
+        Adds labels to many messages at once. `label_requests` is a list of
+        (msg_id, labels) pairs; the modify calls are sent as Gmail batch requests
+        of up to `batch_size` calls each (one HTTP round trip per batch), falling
+        back to one call per message if a batch request cannot be sent.
+
+        :return: IDs of the messages that could not be labeled.
+        """
+        if not label_requests:
+            return []
+
+        # Resolve each distinct label name to its ID once, rather than once per message
+        label_ids = {}
+        for _, labels in label_requests:
+            for lbl in labels:
+                if lbl not in label_ids:
+                    label_ids[lbl] = self._get_or_create_label(lbl)
+
+        # One modify per message (batch request IDs must be unique), merging repeated IDs
+        merged: Dict[str, List[str]] = {}
+        for msg_id, labels in label_requests:
+            merged.setdefault(msg_id, [])
+            for lbl in labels:
+                if label_ids[lbl] not in merged[msg_id]:
+                    merged[msg_id].append(label_ids[lbl])
+        requests = list(merged.items())
+
+        failed = {}
+        completed = set()  # IDs whose batch callback already ran (succeeded or failed)
+
+        def _on_response(request_id, response, exception):
+            completed.add(request_id)
+            if exception is not None:
+                logger.debug(f"An error occurred while adding labels to message {request_id}: {exception}")
+                failed[request_id] = None
+
+        for start in range(0, len(requests), batch_size):
+            chunk = requests[start:start + batch_size]
+            try:
+                batch = self.service.new_batch_http_request(callback=_on_response)
+                for msg_id, add_label_ids in chunk:
+                    batch.add(self._modify_labels_request(msg_id, add_label_ids=add_label_ids), request_id=msg_id)
+                batch.execute()
+                logger.debug(f"Batch-labeled {len(chunk)} messages.")
+            except Exception as error:
+                # Only re-send the messages the batch did not get to
+                remaining = [(msg_id, add_label_ids) for msg_id, add_label_ids in chunk if msg_id not in completed]
+                logger.debug(
+                    f"Batch labeling failed ({error}); labeling {len(remaining)} remaining messages individually."
+                )
+                for msg_id, add_label_ids in remaining:
+                    if not self._modify_labels(msg_id, add_label_ids=add_label_ids):
+                        failed[msg_id] = None
+
+        return list(failed)
 
     def switch_label(
             self,
             msg_id: str,
             remove_labels: Optional[List[str]] = None,
             add_labels: Optional[List[str]] = None,
+            thread_id: Optional[str] = None,
     ):
         """
         Removes the given `remove_labels` and adds the `add_labels` to every message
-        in the thread of the given `msg_id`.
+        in the thread of the given `msg_id`, with a single threads.modify call.
+        Pass `thread_id` if it is already known to skip looking it up from `msg_id`.
         """
         try:
-            # Fetch the thread ID for the given message
-            message = self.service.users().messages().get(userId="me", id=msg_id).execute()
-            thread_id = message.get("threadId")
-
-            # Fetch all messages in the thread
-            thread = self.service.users().threads().get(userId="me", id=thread_id).execute()
-            messages = thread.get("messages", [])
-
-            # Apply label changes to each message in the thread
-            for msg in messages:
-                current_msg_id = msg["id"]
-                if remove_labels:
-                    self._remove_labels(current_msg_id, remove_labels)
-                if add_labels:
-                    self._add_labels(current_msg_id, add_labels)
+            # Resolve label names to IDs once for the whole thread
+            add_label_ids = [self._get_or_create_label(lbl) for lbl in add_labels or []]
+            remove_label_ids = [self._get_or_create_label(lbl) for lbl in remove_labels or []]
+            if not add_label_ids and not remove_label_ids:
+                return
+
+            # Fetch only the thread ID for the given message, unless the caller has it
+            if thread_id is None:
+                thread_id = self._get_thread_id(msg_id)
+
+            # Apply the same label changes to every message in the thread with one call
+            self.service.users().threads().modify(
+                userId="me",
+                id=thread_id,
+                body={"addLabelIds": add_label_ids, "removeLabelIds": remove_label_ids}
+            ).execute()
 
-                logger.debug(
-                    f"Message {current_msg_id} in thread {thread_id} updated: "
-                    f"removed {remove_labels or []}, added {add_labels or []}."
-                )
+            logger.debug(
+                f"Thread {thread_id} updated: "
+                f"removed {remove_labels or []}, added {add_labels or []}."
+            )
 
         except HttpError as error:
             logger.debug(f"An error occurred while switching labels on thread: {error}")
@@ -244,6 +730,51 @@ class GmailClient:
     # -------------------------------------------------------------------------
     # Updated helper method: Build MIME message (HTML by default), multiple attachments
     # -------------------------------------------------------------------------
+    @staticmethod
+    def _encode_file_base64(path: str) -> str:
+        """
+        Returns the MIME base64 encoding of the file at `path`, reading it in
+        slices rather than holding the whole binary file and its encoding at once.
+        """
+        chunks = []
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(_BASE64_CHUNK_BYTES)
+                if not data:
+                    break
+                chunks.append(base64.encodebytes(data).decode("ascii"))
+        return "".join(chunks)
+
+    @staticmethod
+    def _upload_fields(
+        message: MIMEMultipart,
+        has_attachments: bool = False
+    ) -> Tuple[Dict[str, str], Optional[MediaIoBaseUpload]]:
+        """
+        Serializes `message` for messages.send / drafts.create.
+
+        Small messages without attachments return ({"raw": <base64url>}, None).
+        Otherwise the serialized bytes are returned as a `message/rfc822` media
+        upload with no `raw` field, avoiding the base64 copy in memory and
+        its ~33% overhead on the wire. Uploads over the size threshold are resumable.
+
+        :return: (fields to merge into the message resource, media_body or None)
+        """
+        buf = io.BytesIO()
+        BytesGenerator(buf, mangle_from_=False, policy=message.policy).flatten(message)
+        size = buf.getbuffer().nbytes
+
+        if not has_attachments and size <= _MEDIA_UPLOAD_THRESHOLD:
+            return {"raw": base64.urlsafe_b64encode(buf.getbuffer()).decode("ascii")}, None
+
+        buf.seek(0)
+        media = MediaIoBaseUpload(
+            buf,
+            mimetype="message/rfc822",
+            resumable=size > _MEDIA_UPLOAD_THRESHOLD
+        )
+        return {}, media
+
     def _build_mime_message(
         self,
         to_addrs: List[str],
@@ -255,11 +786,17 @@ class GmailClient:
         attachment_paths: Optional[List[str]] = None,
         in_reply_to: Optional[str] = None,
         references: Optional[str] = None,
-        is_html: bool = True
+        is_html: bool = True,
+        attachment_blobs: Optional[List[Tuple[str, str]]] = None,
+        attachments_validated: bool = False
     ) -> MIMEMultipart:
         """
         Builds a MIMEMultipart email. Sends HTML by default,
         and can attach multiple files if attachment_paths is provided.
+        `attachment_blobs` are (filename, base64-encoded content) pairs that are
+        attached as-is, so callers can reuse already-encoded files.
+        `attachments_validated` means the caller already checked the paths with
+        `stat_attachment`, so they are attached without checking them again.
         """
         message = MIMEMultipart()
         message["to"] = ", ".join(to_addrs)
@@ -283,11 +820,10 @@ class GmailClient:
         # Attach multiple files if provided
         if attachment_paths:
             for attach_path in attachment_paths:
-                if attach_path and os.path.exists(attach_path):
-                    with open(attach_path, "rb") as f:
-                        mime_base = MIMEBase("application", "octet-stream")
-                        mime_base.set_payload(f.read())
-                    encoders.encode_base64(mime_base)
+                if attachments_validated or (attach_path and os.path.exists(attach_path)):
+                    mime_base = MIMEBase("application", "octet-stream")
+                    mime_base.set_payload(self._encode_file_base64(attach_path))
+                    mime_base["Content-Transfer-Encoding"] = "base64"
                     filename = os.path.basename(attach_path)
                     mime_base.add_header(
                         "Content-Disposition",
@@ -295,6 +831,18 @@ class GmailClient:
                     )
                     message.attach(mime_base)
 
+        # Attach pre-encoded files without re-reading or re-encoding them
+        if attachment_blobs:
+            for filename, encoded in attachment_blobs:
+                mime_base = MIMEBase("application", "octet-stream")
+                mime_base.set_payload(encoded)
+                mime_base["Content-Transfer-Encoding"] = "base64"
+                mime_base.add_header(
+                    "Content-Disposition",
+                    f'attachment; filename="{filename}"'
+                )
+                message.attach(mime_base)
+
         return message
 
     def send_email(
@@ -306,10 +854,13 @@ class GmailClient:
             cc_addrs: Optional[List[str]] = None,
             bcc_addrs: Optional[List[str]] = None,
             attachment_paths: Optional[List[str]] = None,
-            msg_id: Optional[str] = None  # New parameter for replying to a specific message
-    ):
+            msg_id: Optional[str] = None,  # New parameter for replying to a specific message
+            attachment_blobs: Optional[List[Tuple[str, str]]] = None
+    ) -> Optional[str]:
         """
         Sends an email (HTML by default). Supports replying to a specific message if `msg_id` is provided.
+        `attachment_blobs` are (filename, base64-encoded content) pairs attached without re-encoding.
+        Returns the ID of the sent message, or None if sending failed.
         """
         try:
             in_reply_to = None
@@ -319,19 +870,22 @@ class GmailClient:
             # If replying to an existing message, fetch its headers and thread information
             if msg_id:
                 original_message = self.service.users().messages().get(
-                    userId="me", id=msg_id
+                    userId="me",
+                    id=msg_id,
+                    format="metadata",
+                    metadataHeaders=["Message-ID"],
+                    fields="threadId,payload/headers"
                 ).execute()
                 thread_id = original_message.get("threadId")
-                for header in original_message.get("payload", {}).get("headers", []):
-                    if header["name"] == "Message-ID":
-                        in_reply_to = header["value"]
-                        references = header["value"]
+                headers = original_message.get("payload", {}).get("headers", [])
+                in_reply_to = next(
+                    (h["value"] for h in headers if h["name"].lower() == "message-id"), None
+                )
+                references = in_reply_to
 
-            # Validate attachment paths
-            if attachment_paths:
-                for path in attachment_paths:
-                    if not os.path.isfile(path):
-                        raise FileNotFoundError(f"Attachment path is invalid: {path}")
+            # Validate attachment paths (one stat per file)
+            for attach_path in attachment_paths or []:
+                stat_attachment(attach_path)
 
             # Build the MIME message (HTML)
             message = self._build_mime_message(
@@ -344,33 +898,40 @@ class GmailClient:
                 attachment_paths=attachment_paths,
                 in_reply_to=in_reply_to,
                 references=references,
-                is_html=True
+                is_html=True,
+                attachment_blobs=attachment_blobs,
+                attachments_validated=True
             )
 
-            encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
-
-            send_body = {
-                "raw": encoded_message
-            }
+            send_body, media = self._upload_fields(
+                message, has_attachments=bool(attachment_paths or attachment_blobs)
+            )
+            # The serialized copy is all that's needed now; free the MIME tree (and its
+            # encoded attachment payloads) before the upload
+            del message
 
             # Include thread ID if replying to a specific message
             if thread_id:
                 send_body["threadId"] = thread_id
 
             # Send the email
-            self.service.users().messages().send(
+            sent_message = self.service.users().messages().send(
                 userId="me",
-                body=send_body
+                body=send_body,
+                media_body=media
             ).execute()
 
             logger.debug("Email sent successfully (HTML).")
+            return sent_message.get("id")
         except FileNotFoundError as error:
             logger.error(f"File error: {error}")
             raise  # Re-raise the error to indicate a critical failure
         except HttpError as error:
             logger.debug(f"An error occurred while sending email: {error}")
+            return None
         except Exception as error:
             logger.debug(f"An unexpected error occurred: {error}")
+            return None
 
     def save_draft(
             self,
@@ -381,12 +942,15 @@ class GmailClient:
             from_addr: Optional[str] = None,
             cc_addrs: Optional[List[str]] = None,
             bcc_addrs: Optional[List[str]] = None,
-            attachment_paths: Optional[List[str]] = None
-    ) -> bool:
+            attachment_paths: Optional[List[str]] = None,
+            attachment_blobs: Optional[List[Tuple[str, str]]] = None
+    ) -> Optional[str]:
         """
         Saves an email draft as HTML by default.
         If `msg_id` is provided, attaches the draft to that thread.
         Supports multiple attachments. Validates attachment paths.
+        `attachment_blobs` are (filename, base64-encoded content) pairs attached without re-encoding.
+        Returns the message ID of the created draft, or None if saving failed.
         """
         try:
             in_reply_to = None
@@ -396,22 +960,22 @@ class GmailClient:
             # If replying to an existing message, fetch its headers & thread info
             if msg_id:
                 original_message = self.service.users().messages().get(
-                    userId="me", id=msg_id
+                    userId="me",
+                    id=msg_id,
+                    format="metadata",
+                    metadataHeaders=["Message-ID"],
+                    fields="threadId,payload/headers"
                 ).execute()
                 thread_id = original_message.get("threadId")
-                for header in original_message.get("payload", {}).get("headers", []):
-                    if header["name"] == "Message-ID":
-                        in_reply_to = header["value"]
-                        references = header["value"]
-                    elif header["name"] == "Subject":
-                        # Optionally keep or modify the subject here
-                        pass
-
-            # Validate attachment paths
-            if attachment_paths:
-                for path in attachment_paths:
-                    if not os.path.isfile(path):
-                        raise FileNotFoundError(f"Attachment path is invalid: {path}")
+                headers = original_message.get("payload", {}).get("headers", [])
+                in_reply_to = next(
+                    (h["value"] for h in headers if h["name"].lower() == "message-id"), None
+                )
+                references = in_reply_to
+
+            # Validate attachment paths (one stat per file)
+            for attach_path in attachment_paths or []:
+                stat_attachment(attach_path)
 
             # Build the MIME message (HTML)
             message = self._build_mime_message(
@@ -424,53 +988,65 @@ class GmailClient:
                 attachment_paths=attachment_paths,
                 in_reply_to=in_reply_to,
                 references=references,
-                is_html=True
+                is_html=True,
+                attachment_blobs=attachment_blobs,
+                attachments_validated=True
             )
 
-            encoded_message = base64.urlsafe_b64encode(
-                message.as_bytes()
-            ).decode("utf-8")
+            message_fields, media = self._upload_fields(
+                message, has_attachments=bool(attachment_paths or attachment_blobs)
+            )
+            del message  # Free the MIME tree before the upload, as in send_email
 
             draft_body = {
                 "message": {
                     "threadId": thread_id,
-                    "raw": encoded_message
+                    **message_fields
                 }
             }
 
-            self.service.users().drafts().create(
+            draft = self.service.users().drafts().create(
                 userId="me",
-                body=draft_body
+                body=draft_body,
+                media_body=media
             ).execute()
 
             logger.debug("Draft saved successfully (HTML).")
-            return True
+            return draft.get("message", {}).get("id")
         except FileNotFoundError as error:
             logger.error(f"File error: {error}")
             raise  # Re-raise the error to indicate a critical failure
         except HttpError as error:
             logger.debug(f"An error occurred while saving draft: {error}")
-            return False
+            return None
         except Exception as error:
             logger.debug(f"An unexpected error occurred: {error}")
-            return False
+            return None
 
-    def fetch_thread(self, root_msg_id: str) -> List[Dict[str, str]]:
+    def fetch_thread(self, root_msg_id: str, thread_id: Optional[str] = None) -> List[Dict[str, str]]:
         """
         Fetches a thread given the root message ID. Returns a list of messages
         (dict) with minimal fields: subject, from, date, snippet, etc.
+
+        :param root_msg_id: ID of a message in the thread.
+        :param thread_id: The thread's ID, if already known; skips looking it up from `root_msg_id`.
         """
         try:
-            msg = self.service.users().messages().get(userId="me", id=root_msg_id).execute()
-            thread_id = msg.get("threadId")
+            if thread_id is None:
+                thread_id = self._get_thread_id(root_msg_id)
 
-            thread = self.service.users().threads().get(userId="me", id=thread_id).execute()
+            thread = self.service.users().threads().get(
+                userId="me",
+                id=thread_id,
+                format="metadata",
+                metadataHeaders=["Subject", "From", "Date", "To"],
+                fields="messages(id,snippet,payload/headers)"
+            ).execute()
             messages = thread.get("messages", [])
 
             results = []
             for m in messages:
-                headers = m.get("payload", {}).get("headers", [])
-                header_map = {h["name"].lower(): h["value"] for h in headers}
+                header_map = self._extract_headers(m.get("payload", {}).get("headers", []))
                 snippet = m.get("snippet", "")
 
                 snippet_trimmed = html.unescape(self._trim_snippet(snippet))
@@ -478,10 +1054,10 @@ class GmailClient:
                 results.append({
                     "id": m["id"],
                     "threadId": thread_id,
-                    "subject": header_map.get("subject", ""),
-                    "from": header_map.get("from", ""),
-                    "date": header_map.get("date", ""),
-                    "to": header_map.get("to", ""),
+                    "subject": header_map["subject"],
+                    "from": header_map["from"],
+                    "date": header_map["date"],
+                    "to": header_map["to"],
                     "snippet": snippet_trimmed,
                 })
 
@@ -495,26 +1071,11 @@ class GmailClient:
         Naïvely removes reply/forward quoted text from the snippet
         by looking for certain markers like 'On ', ' wrote:', etc.
         """
-        possible_markers = [
-            "On ",
-            "wrote:",
-            "From:",
-            "Subject:"
-        ]
-
-        lower_snippet = snippet.lower()
-        cut_positions = []
-
-        for marker in possible_markers:
-            idx = lower_snippet.find(marker.lower())
-            if idx != -1:
-                cut_positions.append(idx)
-
-        if not cut_positions:
+        match = _SNIPPET_MARKER_RE.search(snippet)
+        if not match:
             return snippet
 
-        cutoff = min(cut_positions)
-        trimmed = snippet[:cutoff].rstrip()
+        trimmed = snippet[:match.start()].rstrip()
 
         return trimmed if trimmed else snippet
 
@@ -522,40 +1083,57 @@ class GmailClient:
         """
         Returns the label ID for `label_name`. If it doesn't exist,
         creates it and returns the new label ID.
+
+        Labels are listed once and cached by case-folded name; call
+        `invalidate_label_cache` if labels are changed outside this client.
         """
-        response = self.service.users().labels().list(userId="me").execute()
-        labels = response.get("labels", [])
-        for lbl in labels:
-            if lbl["name"].lower() == label_name.lower():
-                return lbl["id"]
+        key = label_name.casefold()
+        with self._label_lock:
+            if self._label_cache is None:
+                response = self.service.users().labels().list(
+                    userId="me", fields="labels(id,name)"
+                ).execute()
+                self._label_cache = {}
+                for lbl in response.get("labels", []):
+                    self._label_cache.setdefault(lbl["name"].casefold(), lbl["id"])
+
+            label_id = self._label_cache.get(key)
+            if label_id is not None:
+                return label_id
+
+            label_body = {
+                "name": label_name,
+                "labelListVisibility": "labelShow",
+                "messageListVisibility": "show"
+            }
+            new_label = self.service.users().labels().create(
+                userId="me",
+                body=label_body
+            ).execute()
 
-        label_body = {
-            "name": label_name,
-            "labelListVisibility": "labelShow",
-            "messageListVisibility": "show"
-        }
-        new_label = self.service.users().labels().create(
-            userId="me",
-            body=label_body
-        ).execute()
+            self._label_cache[key] = new_label["id"]
+            return new_label["id"]
 
-        return new_label["id"]
+    def invalidate_label_cache(self) -> None:
+        """
+        Discards the cached label name -> ID map so the next lookup re-lists labels.
+        """
+        with self._label_lock:
+            self._label_cache = None
 
     def format_thread(self, thread: List[Dict[str, str]]) -> str:
         """
         Formats a list of messages in a thread into a human-readable string.
         """
-        formatted_thread = []
-        for i, message in enumerate(thread):
-            formatted_thread.append(
-                f"Message {i + 1}:\n"
-                f"  From: {message['from']}\n"
-                f"  Date: {message['date']}\n"
-                f"  Subject: {message['subject']}\n"
-                f"  Body: {message['snippet']}\n"
-                f"{'-' * 40}\n"
-            )
-        return "\n".join(formatted_thread)
+        return "\n".join(
+            f"Message {i}:\n"
+            f"  From: {message['from']}\n"
+            f"  Date: {message['date']}\n"
+            f"  Subject: {message['subject']}\n"
+            f"  Body: {message['snippet']}\n"
+            f"{_THREAD_SEPARATOR}\n"
+            for i, message in enumerate(thread, start=1)
+        )
 
     def get_labels(self, msg_id: str) -> List[str]:
         """
@@ -565,7 +1143,8 @@ class GmailClient:
             message = self.service.users().messages().get(
                 userId="me",
                 id=msg_id,
-                format="metadata"
+                format="minimal",
+                fields="labelIds"
             ).execute()
             return message.get("labelIds", [])
         except HttpError as error: